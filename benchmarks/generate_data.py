@@ -0,0 +1,257 @@
+import io
+import csv
+import sys
+import uuid
+import random
+import zipfile
+import argparse
+from datetime import datetime, timedelta
+
+import pyodbc
+import pyarrow as pa
+import pyarrow.parquet as pq
+from PIL import Image
+from azure.storage.blob import BlobServiceClient
+
+# Compte de développement d'Azurite (clé publique, documentée par Microsoft)
+AZURITE_ACCOUNT_NAME = "devstoreaccount1"
+AZURITE_ACCOUNT_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+AZURITE_ENDPOINT = "http://127.0.0.1:10000/devstoreaccount1"
+
+# Base SQL Server locale (voir docker-compose.yml)
+SQL_SERVER = "127.0.0.1,1433"
+SQL_USERNAME = "sa"
+SQL_PASSWORD = "Bench_Passw0rd!"
+SQL_DATABASE = "AdventureWorksBench"
+# ODBC Driver 18 chiffre les connexions par défaut : le certificat auto-signé du conteneur est accepté
+SQL_DRIVER = "{ODBC Driver 18 for SQL Server};TrustServerCertificate=yes"
+
+CONTAINER_NAME = "benchmark"
+
+# Tables générées, sur le modèle d'AdventureWorks : (schéma, table, colonnes SQL, lignes par unité d'échelle)
+SQL_TABLES = [
+    ("Production", "Product", [
+        ("ProductID", "int NOT NULL PRIMARY KEY"),
+        ("Name", "nvarchar(50) NOT NULL"),
+        ("ProductNumber", "nvarchar(25) NOT NULL"),
+        ("Color", "nvarchar(15) NULL"),
+        ("ListPrice", "money NOT NULL"),
+        ("Weight", "decimal(8, 2) NULL"),
+        ("SellStartDate", "datetime NOT NULL"),
+        ("rowguid", "uniqueidentifier NOT NULL"),
+        ("ModifiedDate", "datetime NOT NULL"),
+    ], 500),
+    ("Sales", "SalesOrderHeader", [
+        ("SalesOrderID", "int NOT NULL PRIMARY KEY"),
+        ("OrderDate", "datetime NOT NULL"),
+        ("Status", "tinyint NOT NULL"),
+        ("OnlineOrderFlag", "bit NOT NULL"),
+        ("CustomerID", "int NOT NULL"),
+        ("TerritoryID", "int NULL"),
+        ("SubTotal", "money NOT NULL"),
+        ("TaxAmt", "money NOT NULL"),
+        ("TotalDue", "money NOT NULL"),
+        ("Comment", "nvarchar(128) NULL"),
+        ("rowguid", "uniqueidentifier NOT NULL"),
+        ("ModifiedDate", "datetime NOT NULL"),
+    ], 30000),
+    ("Sales", "SalesOrderDetail", [
+        ("SalesOrderDetailID", "int NOT NULL PRIMARY KEY"),
+        ("SalesOrderID", "int NOT NULL"),
+        ("OrderQty", "smallint NOT NULL"),
+        ("ProductID", "int NOT NULL"),
+        ("UnitPrice", "money NOT NULL"),
+        ("UnitPriceDiscount", "money NOT NULL"),
+        ("rowguid", "uniqueidentifier NOT NULL"),
+        ("ModifiedDate", "datetime NOT NULL"),
+    ], 120000),
+    ("Person", "Person", [
+        ("BusinessEntityID", "int NOT NULL PRIMARY KEY"),
+        ("PersonType", "nchar(2) NOT NULL"),
+        ("FirstName", "nvarchar(50) NOT NULL"),
+        ("LastName", "nvarchar(50) NOT NULL"),
+        ("EmailPromotion", "int NOT NULL"),
+        ("rowguid", "uniqueidentifier NOT NULL"),
+        ("ModifiedDate", "datetime NOT NULL"),
+    ], 20000),
+]
+
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliett",
+         "kilo", "lima", "mike", "november", "oscar", "papa", "quebec", "romeo", "sierra", "tango"]
+COLORS = ["Black", "Red", "Silver", "Blue", "Yellow", None]
+FIRST_NAMES = ["Ken", "Terri", "Roberto", "Rob", "Gail", "Jossef", "Dylan", "Diane", "Gigi", "Michael"]
+LAST_NAMES = ["Sánchez", "Duffy", "Tamburello", "Walters", "Erickson", "Goldberg", "Miller", "Margheim"]
+
+
+def sql_rows(table, count, rng):
+    """
+    Génère les lignes synthétiques d'une table SQL.
+    """
+    start = datetime(2011, 5, 31)
+    for key in range(1, count + 1):
+        modified = start + timedelta(minutes=rng.randrange(0, 60 * 24 * 365 * 3))
+        rowguid = str(uuid.UUID(int=rng.getrandbits(128)))
+        if table == "Product":
+            yield (key, f"Product {key}", f"PR-{key:06d}", rng.choice(COLORS), round(rng.uniform(1, 3500), 4),
+                   round(rng.uniform(0.1, 100), 2) if rng.random() > 0.3 else None, start, rowguid, modified)
+        elif table == "SalesOrderHeader":
+            subtotal = round(rng.uniform(1, 20000), 4)
+            tax = round(subtotal * 0.08, 4)
+            yield (key, modified, rng.randrange(1, 6), rng.random() > 0.5, rng.randrange(1, 20000),
+                   rng.randrange(1, 11), subtotal, tax, round(subtotal + tax, 4),
+                   " ".join(rng.choices(WORDS, k=8)) if rng.random() > 0.8 else None, rowguid, modified)
+        elif table == "SalesOrderDetail":
+            yield (key, rng.randrange(1, count // 4 + 2), rng.randrange(1, 20), rng.randrange(1, 500),
+                   round(rng.uniform(1, 3500), 4), 0.0, rowguid, modified)
+        else:
+            yield (key, rng.choice(["EM", "IN", "SC", "VC"]), rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                   rng.randrange(0, 3), rowguid, modified)
+
+
+def load_sql_tables(scale, rng, batch_size=10000):
+    """
+    Crée la base de benchmark et y charge les tables synthétiques (remplacées à chaque génération).
+    """
+    connection_string = f"DRIVER={SQL_DRIVER};SERVER={SQL_SERVER};UID={SQL_USERNAME};PWD={SQL_PASSWORD}"
+    with pyodbc.connect(connection_string, autocommit=True) as connection:
+        connection.execute(f"IF DB_ID('{SQL_DATABASE}') IS NULL CREATE DATABASE [{SQL_DATABASE}]")
+
+    with pyodbc.connect(f"{connection_string};DATABASE={SQL_DATABASE}", autocommit=True) as connection:
+        cursor = connection.cursor()
+        cursor.fast_executemany = True
+        for schema, table, columns, rows_per_scale in SQL_TABLES:
+            count = max(1, int(rows_per_scale * scale))
+            cursor.execute(f"IF SCHEMA_ID('{schema}') IS NULL EXEC('CREATE SCHEMA [{schema}]')")
+            cursor.execute(f"DROP TABLE IF EXISTS [{schema}].[{table}]")
+            cursor.execute(f"CREATE TABLE [{schema}].[{table}] ({', '.join(f'[{name}] {kind}' for name, kind in columns)})")
+            insert = (
+                f"INSERT INTO [{schema}].[{table}] ({', '.join(f'[{name}]' for name, _ in columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})"
+            )
+            batch = []
+            for row in sql_rows(table, count, rng):
+                batch.append(row)
+                if len(batch) == batch_size:
+                    cursor.executemany(insert, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(insert, batch)
+            print(f"{schema}.{table} : {count} lignes chargées.")
+
+
+def png_bytes(rng, size=64):
+    """
+    Génère une petite image PNG aléatoire.
+    """
+    image = Image.frombytes("RGB", (size, size), rng.randbytes(size * size * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def parquet_file(rows, rng, image_size=64):
+    """
+    Génère un fichier Parquet dont la colonne `image` est une structure {bytes, path},
+    comme les jeux de données d'images du conteneur.
+    """
+    item_ids = [f"item_{rng.getrandbits(48):012x}" for _ in range(rows)]
+    images = [{"bytes": png_bytes(rng, image_size), "path": f"{item_id}.png"} for item_id in item_ids]
+    table = pa.table({
+        "item_ID": item_ids,
+        "title": [" ".join(rng.choices(WORDS, k=6)) for _ in range(rows)],
+        "price": [round(rng.uniform(1, 500), 2) for _ in range(rows)],
+        "category": [rng.choice(WORDS) for _ in range(rows)],
+        "image": pa.array(images, type=pa.struct([("bytes", pa.binary()), ("path", pa.string())])),
+    })
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=1000)
+    return buffer.getvalue()
+
+
+def csv_bytes(rows, rng):
+    """
+    Génère un CSV de textes annotés, comme les jeux de données NLP du conteneur.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["id", "text", "label", "score"])
+    for index in range(rows):
+        writer.writerow([index, " ".join(rng.choices(WORDS, k=rng.randrange(5, 30))), rng.choice(["pos", "neg", "neu"]),
+                         round(rng.random(), 4)])
+    return buffer.getvalue().encode("utf-8")
+
+
+def zip_bytes(members, rows, rng):
+    """
+    Génère une archive ZIP de plusieurs CSV.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for index in range(members):
+            archive.writestr(f"part_{index:03d}.csv", csv_bytes(rows, rng))
+    return buffer.getvalue()
+
+
+def upload_blobs(scale, rng):
+    """
+    Crée le conteneur de benchmark dans Azurite et y dépose les fichiers Parquet, ZIP et CSV.
+    """
+    connection_string = (
+        f"DefaultEndpointsProtocol=http;AccountName={AZURITE_ACCOUNT_NAME};"
+        f"AccountKey={AZURITE_ACCOUNT_KEY};BlobEndpoint={AZURITE_ENDPOINT};"
+    )
+    service = BlobServiceClient.from_connection_string(connection_string)
+    container = service.get_container_client(CONTAINER_NAME)
+    if container.exists():
+        container.delete_container()
+    container.create_container()
+
+    blobs = {}
+    for index in range(max(1, int(4 * scale))):
+        blobs[f"images/products_{index:03d}.parquet"] = parquet_file(1000, rng)
+    for folder in ("nlp_data", "machine_learning"):
+        for index in range(max(1, int(2 * scale))):
+            blobs[f"{folder}/archive_{index:03d}.zip"] = zip_bytes(4, 20000, rng)
+            blobs[f"{folder}/sample_{index:03d}.csv"] = csv_bytes(50000, rng)
+
+    for name, data in blobs.items():
+        container.upload_blob(name, data, overwrite=True)
+    total = sum(len(data) for data in blobs.values())
+    print(f"{len(blobs)} blobs déposés dans {CONTAINER_NAME} ({total / (1024 * 1024):.1f} Mo).")
+
+
+def benchmark_env():
+    """
+    Variables d'environnement qui dirigent les scripts d'extraction vers les services locaux.
+    """
+    return {
+        "ACCOUNT_NAME": AZURITE_ACCOUNT_NAME,
+        "ACCOUNT_KEY": AZURITE_ACCOUNT_KEY,
+        "CONTAINER_NAME": CONTAINER_NAME,
+        "BLOB_ENDPOINT": AZURITE_ENDPOINT,
+        "PARQUET_FOLDERS": "images",
+        "DRIVER": SQL_DRIVER,
+        "SERVER": SQL_SERVER,
+        "DATABASE": SQL_DATABASE,
+        "USERNAME": SQL_USERNAME,
+        "PASSWORD": SQL_PASSWORD,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère les données synthétiques des benchmarks.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Facteur d'échelle des volumes générés")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du générateur (données reproductibles)")
+    parser.add_argument("--skip-sql", action="store_true", help="Ne charge pas les tables SQL")
+    parser.add_argument("--skip-blob", action="store_true", help="Ne dépose pas les blobs")
+    args = parser.parse_args(argv)
+
+    if not args.skip_sql:
+        load_sql_tables(args.scale, random.Random(args.seed))
+    if not args.skip_blob:
+        upload_blobs(args.scale, random.Random(args.seed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
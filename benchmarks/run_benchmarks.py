@@ -0,0 +1,204 @@
+import os
+import sys
+import glob
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+from generate_data import benchmark_env
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Étapes mesurées : nom -> script d'extraction
+STAGES = {
+    "sql": "extract_sql.py",
+    "parquet": "extract_parquet.py",
+    "csv": "extract_csv.py",
+}
+
+# Lance un script dans un sous-processus et mesure sa durée et la mémoire maximale de
+# ses processus ; exécuté dans un interpréteur dédié pour que le compteur RUSAGE_CHILDREN
+# ne concerne que cette étape. ru_maxrss est le pic du plus gros processus (le script ou
+# l'un de ses processus d'images), et non la somme de l'arborescence.
+MEASURE = """
+import json, resource, subprocess, sys, time
+start = time.perf_counter()
+returncode = subprocess.run([sys.executable] + sys.argv[1:]).returncode
+elapsed = time.perf_counter() - start
+max_rss_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+print(json.dumps({"returncode": returncode, "elapsed": elapsed, "max_rss_kb": max_rss_kb}))
+"""
+
+# Indicateurs comparés à la référence : (nom, sens d'amélioration)
+TRACKED = [
+    ("elapsed_seconds", "lower"),
+    ("max_rss_mb", "lower"),
+    ("bytes_per_second", "higher"),
+    ("rows_per_second", "higher"),
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_stage(stage, work_dir, env):
+    """
+    Exécute une étape d'extraction dans un répertoire de travail vierge et collecte ses mesures.
+
+    Retourne:
+        dict: Durée, mémoire maximale par processus, débits (rapport de métriques du script) et latences par objet.
+    """
+    if os.path.exists(work_dir):
+        shutil.rmtree(work_dir)
+    os.makedirs(work_dir)
+    metrics_dir = os.path.join(work_dir, "metrics")
+    stage_env = {**os.environ, **env, "METRICS_ENABLED": "1", "METRICS_DIR": metrics_dir, "BLOB_FULL_SYNC": "1"}
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE, os.path.join(ROOT, "scripts", STAGES[stage])],
+        cwd=work_dir, env=stage_env, capture_output=True, text=True,
+    )
+    measure = json.loads(result.stdout.strip().splitlines()[-1])
+    if measure["returncode"] != 0:
+        raise RuntimeError(f"L'étape {stage} a échoué (code {measure['returncode']}) :\n{result.stderr[-2000:]}")
+
+    reports = sorted(glob.glob(os.path.join(metrics_dir, f"{stage}-*.json")))
+    report = {"phases": [], "objects": []}
+    if reports:
+        with open(reports[-1], encoding="utf-8") as file:
+            report = json.load(file)
+
+    # Débit de l'étape : octets lus à la source (téléchargements, lectures par plages, résultats
+    # des requêtes SQL) et lignes écrites, rapportés à la durée totale de l'étape
+    phases = report["phases"]
+    total_bytes = sum(phase["bytes"] for phase in phases if phase["phase"] in ("download", "range_read", "query"))
+    total_rows = sum(phase["rows"] for phase in phases if phase["phase"] in ("query", "write", "unzip"))
+
+    latencies = {}
+    for item in report["objects"]:
+        latencies.setdefault(item["phase"], []).append(item["seconds"])
+
+    return {
+        "elapsed_seconds": measure["elapsed"],
+        "max_rss_mb": measure["max_rss_kb"] / 1024,
+        "bytes": total_bytes,
+        "rows": total_rows,
+        "bytes_per_second": total_bytes / measure["elapsed"] if measure["elapsed"] else 0.0,
+        "rows_per_second": total_rows / measure["elapsed"] if measure["elapsed"] else 0.0,
+        "latency": {
+            phase: {"p50": percentile(values, 0.5), "p95": percentile(values, 0.95), "max": max(values)}
+            for phase, values in latencies.items()
+        },
+        "phases": report["phases"],
+    }
+
+
+def summarize(runs):
+    """
+    Agrège plusieurs répétitions d'une étape (médiane de chaque indicateur suivi).
+    """
+    summary = {name: statistics.median(run[name] for run in runs) for name, _ in TRACKED}
+    summary["repeats"] = len(runs)
+    summary["latency"] = runs[len(runs) // 2]["latency"]
+    summary["phases"] = runs[len(runs) // 2]["phases"]
+    return summary
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare les résultats à la référence et retourne la liste des régressions.
+
+    Un indicateur régresse s'il se dégrade de plus de `tolerance` (ex : 0.1 pour 10 %).
+    """
+    regressions = []
+    for stage, summary in results.items():
+        reference = baseline.get("stages", {}).get(stage)
+        if not reference:
+            continue
+        for name, direction in TRACKED:
+            current, previous = summary.get(name), reference.get(name)
+            if not previous or current is None:
+                continue
+            change = (current - previous) / previous
+            if (direction == "lower" and change > tolerance) or (direction == "higher" and change < -tolerance):
+                regressions.append(f"{stage}.{name} : {previous:.4g} -> {current:.4g} ({change:+.1%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesure les étapes d'extraction contre Azurite et un SQL Server local.")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Étapes à mesurer, séparées par des virgules")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de répétitions par étape (médiane retenue)")
+    parser.add_argument("--baseline", default=os.path.join(BENCHMARK_DIR, "baseline.json"), help="Fichier de référence")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Dégradation tolérée avant de signaler une régression")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistre les résultats comme nouvelle référence")
+    parser.add_argument("--work-dir", default=None, help="Répertoire de travail (temporaire par défaut)")
+    parser.add_argument("--env", action="append", default=[], metavar="NOM=VALEUR",
+                        help="Variable transmise aux étapes (ex : TRANSFORM_ENGINE=polars), répétable")
+    args = parser.parse_args(argv)
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"étape(s) inconnue(s) : {', '.join(unknown)}")
+
+    overrides = {}
+    for assignment in args.env:
+        name, separator, value = assignment.partition("=")
+        if not separator:
+            parser.error(f"--env attend NOM=VALEUR : {assignment}")
+        overrides[name] = value
+    env = {**benchmark_env(), **overrides}
+    work_root = args.work_dir or tempfile.mkdtemp(prefix="extraction-bench-")
+    results = {}
+    for stage in stages:
+        runs = []
+        for repeat in range(args.repeat):
+            run = run_stage(stage, os.path.join(work_root, f"{stage}-{repeat}"), env)
+            print(f"{stage} #{repeat + 1} : {run['elapsed_seconds']:.2f} s, {run['max_rss_mb']:.0f} Mo, "
+                  f"{run['bytes_per_second'] / (1024 * 1024):.1f} Mo/s, {run['rows_per_second']:.0f} lignes/s")
+            runs.append(run)
+        results[stage] = summarize(runs)
+
+    output = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "env": overrides,
+        "stages": results,
+    }
+    results_dir = os.path.join(BENCHMARK_DIR, "results")
+    os.makedirs(results_dir, exist_ok=True)
+    results_path = os.path.join(results_dir, f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json")
+    with open(results_path, "w", encoding="utf-8") as file:
+        json.dump(output, file, indent=2)
+    print(f"Résultats : {results_path}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(output, file, indent=2)
+        print(f"Référence enregistrée : {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Aucune référence enregistrée (--save-baseline pour en créer une).")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as file:
+        regressions = compare(results, json.load(file), args.tolerance)
+    if regressions:
+        print("Régressions détectées :")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print("Aucune régression par rapport à la référence.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -49,8 +49,7 @@ pip install -r requirements.txt
 echo "CREATION DU FICHIER .env AVEC LES VARIABLES D'ENVIRONNEMENT ET GENERATION D'UN SAS TOKEN"
 python3 scripts/generate_env_file.py
 
-# Lancement des scripts d'extraction de données
-echo "LANCEMENT DES SCRIPTS D'EXTRACTION DE DONNEES"
-python3 scripts/extract_sql.py
-python3 scripts/extract_parquet.py
-python3 scripts/extract_csv.py
\ No newline at end of file
+# Lancement du pipeline d'extraction : SQL Server et le conteneur Blob sont extraits
+# en parallèle, puis les données sont enregistrées dans le catalogue DuckDB et le magasin Arrow
+echo "LANCEMENT DU PIPELINE D'EXTRACTION DE DONNEES"
+python3 scripts/pipeline.py
\ No newline at end of file
@@ -0,0 +1,304 @@
+import os
+import time
+import fcntl
+import shutil
+import hashlib
+import logging
+import sqlite3
+import threading
+
+import metrics
+import log_setup
+from blob_download import stream_blob_to_file
+
+# Répertoire du cache partagé par les extracteurs (et par plusieurs exécutions sur la même machine)
+CACHE_DIR = os.getenv("BLOB_CACHE_DIR", "./data/.cache/blobs")
+
+# Taille maximale du cache en Mo ; 0 désactive le cache
+CACHE_MAX_SIZE_MB = float(os.getenv("BLOB_CACHE_MAX_SIZE_MB", "10240"))
+
+# Taille des blocs lus pour calculer l'empreinte d'un fichier (4 Mo)
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Nombre de verrous de téléchargement (fichiers `locks/NN.lock` réutilisés d'une version de blob à l'autre)
+LOCK_STRIPES = 256
+
+
+def file_md5(path):
+    """
+    Calcule l'empreinte MD5 (hexadécimale) d'un fichier, bloc par bloc.
+    """
+    digest = hashlib.md5()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def link_or_copy(source, destination):
+    """
+    Place une copie de `source` en `destination` : lien physique si les deux chemins sont
+    sur le même système de fichiers (aucune copie d'octets), copie sinon. Le remplacement
+    de la destination est atomique.
+    """
+    directory = os.path.dirname(destination)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{destination}.link"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
+
+
+class BlobCache:
+    """
+    Cache local des blobs, adressé par contenu et borné en taille (éviction LRU).
+
+    Chaque contenu est stocké une seule fois sous `objects/<md5>` ; un index SQLite
+    associe chaque version de blob (compte, conteneur, nom et ETag) à l'empreinte de
+    son contenu. Deux blobs identiques, dans des dossiers différents, partagent donc le
+    même objet : lorsque le listing fournit le Content-MD5 d'un blob, un contenu déjà
+    présent est réutilisé sans téléchargement, même sous un autre nom.
+
+    Les fichiers demandés sont des liens physiques vers les objets du cache (copies
+    si le cache est sur un autre système de fichiers) ; ils ne doivent pas être
+    modifiés sur place. Quand la taille totale dépasse la limite, les objets les moins
+    récemment utilisés sont supprimés ; les fichiers déjà livrés restent intacts.
+
+    L'index tolère plusieurs processus partageant le même répertoire de cache, et un
+    verrou de téléchargement (parmi LOCK_STRIPES fichiers réutilisés) garantit qu'une
+    version de blob n'est téléchargée que par l'un d'entre eux : les autres attendent
+    puis la trouvent dans le cache. Un objet est toujours lié vers sa destination sous
+    le verrou d'écriture de l'index, qui l'empêche d'être évincé entre-temps.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_size=int(CACHE_MAX_SIZE_MB * 1024 * 1024)):
+        """
+        Arguments:
+            directory (str): Répertoire du cache.
+            max_size (int): Taille maximale (octets) des objets conservés.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.objects_dir = os.path.join(directory, "objects")
+        self.downloads_dir = os.path.join(directory, "downloads")
+        self.locks_dir = os.path.join(directory, "locks")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.downloads_dir, exist_ok=True)
+        os.makedirs(self.locks_dir, exist_ok=True)
+        self.index_path = os.path.join(directory, "index.sqlite")
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS objects ("
+                "digest TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                "blob_key TEXT NOT NULL, etag TEXT NOT NULL, digest TEXT NOT NULL, "
+                "PRIMARY KEY (blob_key, etag))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS blobs_digest ON blobs (digest)")
+
+    def _connect(self):
+        # Une connexion par thread : sqlite3 interdit le partage d'une connexion entre threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.index_path, timeout=60)
+        return conn
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def lookup(self, blob_key, etag, content_md5=None, deliver_to=None):
+        """
+        Recherche le contenu d'une version de blob, par nom et ETag puis par Content-MD5.
+
+        Arguments:
+            deliver_to (str): Chemin vers lequel lier l'objet trouvé ; le lien est créé sous
+                le verrou d'écriture de l'index, si bien qu'une éviction concurrente ne peut
+                pas supprimer l'objet entre la recherche et la livraison.
+
+        Retourne:
+            str: Chemin de l'objet dans le cache, ou None s'il est absent.
+        """
+        conn = self._connect()
+        with conn:
+            # Même verrou que `evict` : l'objet trouvé reste présent jusqu'à la fin de la transaction
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT digest FROM blobs WHERE blob_key = ? AND etag = ?", (blob_key, etag)).fetchone()
+            digest = row[0] if row else content_md5
+            if digest is None:
+                return None
+            path = self.object_path(digest)
+            if not os.path.exists(path):
+                # Objet supprimé hors du cache (ou évincé par un autre processus) : l'entrée est obsolète
+                conn.execute("DELETE FROM objects WHERE digest = ?", (digest,))
+                conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                return None
+            conn.execute("UPDATE objects SET last_access = ? WHERE digest = ?", (time.time(), digest))
+            if row is None:
+                conn.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)", (blob_key, etag, digest))
+            if deliver_to is not None:
+                link_or_copy(path, deliver_to)
+        return path
+
+    def add(self, blob_key, etag, file_path, content_md5=None, deliver_to=None):
+        """
+        Ajoute un fichier téléchargé au cache (il est déplacé dans `objects/`).
+
+        Avec `deliver_to`, le fichier vérifié y est lié avant d'entrer dans le cache :
+        une éviction immédiate par un autre processus ne peut plus empêcher sa livraison.
+
+        Lève:
+            ValueError: Si l'empreinte du fichier ne correspond pas au Content-MD5 du blob.
+
+        Retourne:
+            str: Chemin de l'objet dans le cache.
+        """
+        digest = file_md5(file_path)
+        if content_md5 is not None and digest != content_md5:
+            os.remove(file_path)
+            raise ValueError(f"Contenu corrompu pour {blob_key} : MD5 {digest} au lieu de {content_md5}")
+        path = self.object_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = os.path.getsize(file_path)
+        if deliver_to is not None:
+            link_or_copy(file_path, deliver_to)
+        # Un contenu déjà présent (même blob sous un autre nom) n'est conservé qu'une fois
+        os.replace(file_path, path)
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO objects VALUES (?, ?, ?)", (digest, size, time.time()))
+            conn.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)", (blob_key, etag, digest))
+        self.evict(keep=digest)
+        return path
+
+    def size(self):
+        row = self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()
+        return row[0]
+
+    def evict(self, keep=None):
+        """
+        Supprime les objets les moins récemment utilisés jusqu'à revenir sous la taille maximale.
+
+        Arguments:
+            keep (str): Empreinte à ne pas évincer (objet en cours de livraison).
+
+        Retourne:
+            int: Nombre d'octets libérés.
+        """
+        conn = self._connect()
+        freed = 0
+        with conn:
+            # Verrou d'écriture immédiat : deux processus n'évincent pas les mêmes objets
+            conn.execute("BEGIN IMMEDIATE")
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+            if total <= self.max_size:
+                return 0
+            for digest, size in conn.execute("SELECT digest, size FROM objects ORDER BY last_access").fetchall():
+                if total - freed <= self.max_size:
+                    break
+                if digest == keep:
+                    continue
+                path = self.object_path(digest)
+                if os.path.exists(path):
+                    os.remove(path)
+                conn.execute("DELETE FROM objects WHERE digest = ?", (digest,))
+                conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                freed += size
+        if freed:
+            logging.info(f"Cache de blobs : {freed / (1024 * 1024):.1f} Mo libérés (limite {self.max_size / (1024 * 1024):.0f} Mo).")
+        return freed
+
+    def _lock_path(self, blob_key, etag):
+        stripe = int(hashlib.sha1(f"{blob_key}|{etag}".encode()).hexdigest(), 16) % LOCK_STRIPES
+        return os.path.join(self.locks_dir, f"{stripe:02x}.lock")
+
+    def _record_hit(self, blob_name, stage, size):
+        metrics.record(stage, "cache_hit", blob_name, bytes=size)
+        log_setup.item_log("Blobs servis par le cache").record(blob_name, bytes=size)
+
+    def fetch(self, blob_client, file_path, max_concurrency=4, stage="blob", etag=None, size=None, content_md5=None):
+        """
+        Fournit le contenu d'un blob en `file_path`, depuis le cache ou en le téléchargeant.
+
+        En cas d'absence, le blob est téléchargé (avec reprise) dans le répertoire
+        `downloads/` du cache, vérifié, ajouté aux objets puis lié vers `file_path`.
+        Le téléchargement est protégé par un verrou exclusif (`locks/NN.lock`) : un
+        autre processus ou thread qui demande la même version attend sa fin, puis la
+        trouve dans le cache.
+
+        Arguments:
+            blob_client (BlobClient): Client du blob.
+            file_path (str): Chemin final du fichier local.
+            max_concurrency (int): Nombre de plages téléchargées en parallèle pour un grand blob.
+            stage (str): Étape à laquelle l'accès est attribué dans les métriques.
+            etag (str): ETag du blob issu du listing ; lu via ses propriétés s'il est absent.
+            size (int): Taille du blob issue du listing.
+            content_md5 (bytes): Content-MD5 du blob issu du listing, s'il est renseigné.
+
+        Retourne:
+            int: Nombre d'octets téléchargés (0 si le contenu était dans le cache).
+        """
+        if etag is None or size is None:
+            properties = blob_client.get_blob_properties()
+            etag, size = properties.etag, properties.size
+            content_md5 = properties.content_settings.content_md5
+        digest = bytes(content_md5).hex() if content_md5 else None
+        blob_key = f"{blob_client.account_name}/{blob_client.container_name}/{blob_client.blob_name}"
+
+        if self.lookup(blob_key, etag, digest, deliver_to=file_path) is not None:
+            self._record_hit(blob_client.blob_name, stage, size)
+            return 0
+
+        # Nom stable par version de blob : un téléchargement interrompu reprend au même endroit
+        download_path = os.path.join(self.downloads_dir, hashlib.sha1(f"{blob_key}|{etag}".encode()).hexdigest())
+        with open(self._lock_path(blob_key, etag), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Version téléchargée par un autre processus pendant l'attente du verrou
+                if self.lookup(blob_key, etag, digest, deliver_to=file_path) is not None:
+                    self._record_hit(blob_client.blob_name, stage, size)
+                    return 0
+                downloaded = stream_blob_to_file(blob_client, download_path, max_concurrency, stage, etag, size)
+                self.add(blob_key, etag, download_path, digest, deliver_to=file_path)
+                return downloaded
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Retourne le cache du processus (configuré par BLOB_CACHE_DIR et BLOB_CACHE_MAX_SIZE_MB),
+    ou None s'il est désactivé.
+    """
+    global _cache
+    if CACHE_MAX_SIZE_MB <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = BlobCache()
+        return _cache
+
+
+def fetch_blob(blob_client, file_path, max_concurrency=4, stage="blob", etag=None, size=None, content_md5=None):
+    """
+    Télécharge un blob vers `file_path` en passant par le cache local s'il est activé.
+
+    Retourne:
+        int: Nombre d'octets téléchargés lors de cet appel.
+    """
+    cache = get_cache()
+    if cache is None:
+        return stream_blob_to_file(blob_client, file_path, max_concurrency, stage, etag, size)
+    return cache.fetch(blob_client, file_path, max_concurrency, stage, etag, size, content_md5)
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import ContainerClient
+from tqdm import tqdm
+
+import metrics
+from limits import get_limits
+
+
+# Taille par défaut d'un segment téléchargé (4 Mo)
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Taille des tranches validées une à une lors d'un téléchargement (point de reprise, 64 Mo)
+RESUME_SEGMENT_SIZE = int(os.getenv("BLOB_RESUME_SEGMENT_SIZE", str(64 * 1024 * 1024)))
+
+
+def create_container_client(container_url, max_workers=8, chunk_size=DEFAULT_CHUNK_SIZE, max_concurrency=4,
+                            credential=None):
+    """
+    Crée un unique ContainerClient partagé par tous les téléchargements.
+
+    Le client s'appuie sur une session HTTP dont le pool de connexions est
+    dimensionné sur le nombre de workers, afin que chaque thread réutilise
+    une connexion ouverte au lieu d'en négocier une nouvelle par blob.
+
+    Arguments:
+        container_url (str): URL du conteneur avec SAS.
+        max_workers (int): Nombre de téléchargements simultanés prévus.
+        chunk_size (int): Taille (en octets) des segments téléchargés par requête.
+        max_concurrency (int): Nombre de segments d'un même blob téléchargés en parallèle.
+        credential (AzureSasCredential): Credential renouvelable ; l'URL ne doit alors pas contenir de SAS.
+
+    Retourne:
+        ContainerClient: Client du conteneur partagé entre les threads.
+    """
+    pool_size = max_workers * max_concurrency
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    transport = RequestsTransport(session=session, session_owner=False)
+    return ContainerClient.from_container_url(
+        container_url,
+        credential=credential,
+        transport=transport,
+        max_single_get_size=chunk_size,
+        max_chunk_get_size=chunk_size,
+    )
+
+
+def stream_blob_to_file(blob_client, file_path, max_concurrency=4, stage="blob", etag=None, size=None):
+    """
+    Télécharge un blob segment par segment directement dans un fichier local, avec reprise.
+
+    Les segments (de la taille `max_chunk_get_size` du client) sont écrits au fur
+    et à mesure de leur réception : la mémoire utilisée reste de l'ordre de
+    `max_concurrency` segments, quelle que soit la taille du blob. Le contenu est
+    écrit dans un fichier temporaire `.part`, renommé atomiquement une fois complet.
+
+    Le blob est lu par tranches de RESUME_SEGMENT_SIZE octets ; après chaque tranche,
+    la position atteinte et l'ETag du blob sont enregistrés à côté du fichier partiel.
+    Un téléchargement interrompu reprend ainsi au dernier octet validé, y compris lors
+    d'une exécution suivante, tant que le blob n'a pas été modifié entre-temps (les
+    lectures sont conditionnées à son ETag).
+
+    Arguments:
+        blob_client (BlobClient): Client du blob à télécharger.
+        file_path (str): Chemin final du fichier local.
+        max_concurrency (int): Nombre de plages téléchargées en parallèle pour un grand blob.
+        stage (str): Étape à laquelle le téléchargement est attribué dans les métriques.
+        etag (str): ETag du blob issu du listing ; lu via ses propriétés s'il est absent.
+        size (int): Taille du blob issue du listing ; lue via ses propriétés si elle est absente.
+
+    Retourne:
+        int: Nombre d'octets téléchargés lors de cet appel.
+    """
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{file_path}.part"
+    state_path = f"{temp_path}.json"
+    if etag is None or size is None:
+        properties = blob_client.get_blob_properties()
+        etag, size = properties.etag, properties.size
+
+    # Point de reprise d'un téléchargement précédent du même contenu
+    committed = 0
+    if os.path.exists(temp_path) and os.path.exists(state_path):
+        try:
+            with open(state_path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+            if state.get("etag") == etag and state.get("committed", 0) <= os.path.getsize(temp_path):
+                committed = state["committed"]
+        except (OSError, ValueError) as e:
+            logging.warning(f"Point de reprise illisible ({state_path}) : {e}")
+    if committed:
+        logging.info(f"Reprise du téléchargement de {blob_client.blob_name} à l'octet {committed}/{size}.")
+
+    downloaded = 0
+    try:
+        with metrics.timer(stage, "download", blob_client.blob_name) as timer, \
+                open(temp_path, "r+b" if committed else "wb") as file:
+            file.truncate(committed)
+            file.seek(committed)
+            # Le débit des écritures est décompté de la limite globale de bande passante, si elle est définie
+            writer = get_limits().wrap_writer(file)
+            while committed < size:
+                length = min(RESUME_SEGMENT_SIZE, size - committed)
+                downloader = blob_client.download_blob(
+                    offset=committed, length=length, max_concurrency=max_concurrency,
+                    etag=etag, match_condition=MatchConditions.IfNotModified,
+                )
+                written = downloader.readinto(writer)
+                file.flush()
+                committed += written
+                downloaded += written
+                with open(state_path, "w", encoding="utf-8") as state_file:
+                    json.dump({"etag": etag, "size": size, "committed": committed}, state_file)
+            timer.add(bytes=downloaded)
+        os.replace(temp_path, file_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        return downloaded
+    except ResourceModifiedError:
+        # Le blob a changé depuis le début du téléchargement : le fichier partiel est inutilisable
+        for path in (temp_path, state_path):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    except BaseException:
+        # Le fichier partiel et son point de reprise sont conservés pour la prochaine tentative
+        logging.warning(f"Téléchargement de {blob_client.blob_name} interrompu à l'octet {committed}/{size}.")
+        raise
+
+
+def download_blobs(blob_names, task, max_workers=8, max_retries=3, retry_delay=1.0, desc="Téléchargement"):
+    """
+    Exécute une tâche de téléchargement pour chaque blob à l'aide d'un pool de threads.
+
+    Chaque blob est traité indépendamment : en cas d'échec, la tâche est relancée
+    jusqu'à `max_retries` fois (avec un délai croissant) sans interrompre les autres
+    téléchargements. Les erreurs définitives sont collectées et retournées.
+
+    Arguments:
+        blob_names (list): Noms des blobs à traiter.
+        task (callable): Fonction appelée avec le nom du blob, retournant le chemin local du fichier.
+        max_workers (int): Nombre de threads de téléchargement.
+        max_retries (int): Nombre de tentatives supplémentaires par blob.
+        retry_delay (float): Délai initial (en secondes) entre deux tentatives.
+        desc (str): Libellé de la barre de progression.
+
+    Retourne:
+        tuple: (dict des résultats par blob, dict des erreurs par blob).
+    """
+    results = {}
+    errors = {}
+    start = time.perf_counter()
+
+    def run_with_retry(blob_name):
+        for attempt in range(max_retries + 1):
+            try:
+                # Chaque tentative occupe un emplacement de la limite globale d'opérations simultanées
+                with get_limits().slot():
+                    return task(blob_name)
+            except Exception as e:
+                if attempt == max_retries:
+                    raise
+                logging.warning(f"Nouvelle tentative ({attempt + 1}/{max_retries}) pour {blob_name} : {e}")
+                time.sleep(retry_delay * (2 ** attempt))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_with_retry, name): name for name in blob_names}
+        for future in tqdm(as_completed(futures), total=len(futures), desc=desc, unit="fichier"):
+            blob_name = futures[future]
+            try:
+                results[blob_name] = future.result()
+            except Exception as e:
+                errors[blob_name] = e
+                logging.error(f"Échec définitif du téléchargement de {blob_name} : {e}")
+
+    elapsed = time.perf_counter() - start
+    total_bytes = sum(
+        os.path.getsize(path) for path in results.values()
+        if isinstance(path, str) and os.path.isfile(path)
+    )
+    throughput = total_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+    logging.info(
+        f"{len(results)} blobs téléchargés ({total_bytes / (1024 * 1024):.1f} Mo) en {elapsed:.1f} s "
+        f"({throughput:.1f} Mo/s, {max_workers} workers), {len(errors)} en échec."
+    )
+    return results, errors
@@ -0,0 +1,144 @@
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError
+
+import metrics
+from limits import throttle
+
+# Taille des blocs mis en cache (1 Mo) et taille lue d'emblée en fin de fichier (64 Ko)
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+DEFAULT_FOOTER_SIZE = 64 * 1024
+
+
+class BlobRangeFile(io.RawIOBase):
+    """
+    Fichier en lecture seule et positionnable adossé à un blob Azure.
+
+    Chaque lecture est servie par des requêtes `download_blob(offset, length)` : seules
+    les plages réellement lues sont transférées. Les plages sont découpées en blocs
+    conservés dans un cache LRU, et la fin du blob est préchargée à l'ouverture pour
+    que la lecture du pied de page Parquet (ou du répertoire central d'un ZIP) ne coûte
+    qu'une requête. L'objet peut être passé directement à `pyarrow.parquet.ParquetFile`
+    ou à `zipfile.ZipFile`.
+
+    Toutes les requêtes sont conditionnées à l'ETag du blob à l'ouverture : si le blob est
+    remplacé pendant la lecture, `ResourceModifiedError` est levée au lieu de mélanger
+    les octets de deux versions.
+    """
+
+    def __init__(self, blob_client, size=None, block_size=DEFAULT_BLOCK_SIZE,
+                 footer_size=DEFAULT_FOOTER_SIZE, max_cached_blocks=64, stage="blob", etag=None):
+        """
+        Arguments:
+            blob_client (BlobClient): Client du blob à lire.
+            size (int): Taille du blob si elle est déjà connue (listing) ; sinon lue via ses propriétés.
+            block_size (int): Taille des blocs mis en cache.
+            footer_size (int): Nombre d'octets préchargés en fin de blob (0 pour désactiver).
+            max_cached_blocks (int): Nombre maximal de blocs conservés en cache.
+            stage (str): Étape à laquelle les lectures sont attribuées dans les métriques.
+            etag (str): ETag de la version à lire (listing) ; sinon lu via les propriétés du blob.
+        """
+        super().__init__()
+        self.blob_client = blob_client
+        if size is None or etag is None:
+            properties = blob_client.get_blob_properties()
+            size, etag = properties.size, properties.etag
+        self.size = size
+        self.etag = etag
+        self.block_size = block_size
+        self.max_cached_blocks = max_cached_blocks
+        self.position = 0
+        self.bytes_fetched = 0
+        self.requests = 0
+        self.stage = stage
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+        if footer_size and self.size:
+            self._fetch_blocks(max(0, self.size - footer_size) // block_size, (self.size - 1) // block_size)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Valeur de whence invalide : {whence}")
+        if position < 0:
+            raise ValueError("Position négative dans le blob.")
+        self.position = position
+        return self.position
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast("B")
+        length = min(len(view), max(0, self.size - self.position))
+        if length == 0:
+            return 0
+        first = self.position // self.block_size
+        last = (self.position + length - 1) // self.block_size
+        self._fetch_blocks(first, last)
+
+        written = 0
+        with self._lock:
+            for index in range(first, last + 1):
+                block = self._blocks.get(index)
+                if block is None:
+                    # Bloc évincé entre-temps par un autre lecteur : on le recharge
+                    break
+                self._blocks.move_to_end(index)
+                start = self.position + written - index * self.block_size
+                chunk = block[start:start + length - written]
+                view[written:written + len(chunk)] = chunk
+                written += len(chunk)
+        if written < length:
+            self.position += written
+            return written + self.readinto(view[written:length])
+        self.position += written
+        return written
+
+    def _fetch_blocks(self, first, last):
+        """
+        Télécharge en une seule requête la plage couvrant les blocs manquants entre `first` et `last`.
+        """
+        with self._lock:
+            missing = [index for index in range(first, last + 1) if index not in self._blocks]
+        if not missing:
+            return
+        start = missing[0] * self.block_size
+        end = min(self.size, (missing[-1] + 1) * self.block_size)
+        try:
+            with metrics.timer(self.stage, "range_read") as timer:
+                data = self.blob_client.download_blob(
+                    offset=start, length=end - start, etag=self.etag, match_condition=MatchConditions.IfNotModified,
+                ).readall()
+                timer.add(bytes=len(data))
+            throttle(len(data))
+        except ResourceModifiedError:
+            logging.error(f"Le blob {self.blob_client.blob_name} a été modifié pendant sa lecture (ETag {self.etag}).")
+            raise
+        except Exception as e:
+            logging.error(f"Erreur lors de la lecture de la plage {start}-{end} du blob {self.blob_client.blob_name} : {e}")
+            raise
+        with self._lock:
+            self.requests += 1
+            self.bytes_fetched += len(data)
+            for index in range(missing[0], missing[-1] + 1):
+                offset = index * self.block_size - start
+                self._blocks[index] = data[offset:offset + self.block_size]
+                self._blocks.move_to_end(index)
+            while len(self._blocks) > max(self.max_cached_blocks, last - first + 1):
+                self._blocks.popitem(last=False)
@@ -0,0 +1,98 @@
+import logging
+
+import metrics
+
+
+class BlobListing:
+    """
+    Passe de listing unique d'un conteneur, partagée entre plusieurs consommateurs.
+
+    Chaque consommateur déclare les dossiers et extensions qui l'intéressent. Le
+    listing n'interroge que les préfixes correspondants (`name_starts_with`), une
+    seule fois chacun même s'ils sont demandés par plusieurs consommateurs, puis
+    répartit chaque blob à l'aide d'un index précalculé dossier -> consommateurs.
+    Le coût du listing dépend ainsi des préfixes ciblés et non de la taille du conteneur.
+    """
+
+    def __init__(self):
+        self._consumers = {}
+
+    def add_consumer(self, name, extensions, folders=None):
+        """
+        Déclare un consommateur du listing.
+
+        Arguments:
+            name (str): Nom du consommateur (ex : "csv", "parquet").
+            extensions (list): Extensions recherchées (ex : [".csv", ".zip"]).
+            folders (list): Dossiers ciblés ; None pour tout le conteneur.
+        """
+        normalized = [folder.strip("/") for folder in folders] if folders else None
+        self._consumers[name] = (tuple(extensions), normalized)
+
+    def prefixes(self):
+        """
+        Calcule les préfixes à lister, sans doublon ni préfixe inclus dans un autre.
+
+        Retourne:
+            list: Préfixes à interroger ("" pour le conteneur entier).
+        """
+        prefixes = set()
+        for _, folders in self._consumers.values():
+            if not folders:
+                return [""]
+            prefixes.update(f"{folder}/" for folder in folders)
+        return sorted(
+            prefix for prefix in prefixes
+            if not any(prefix != other and prefix.startswith(other) for other in prefixes)
+        )
+
+    def _build_index(self):
+        # Préfixe de dossier -> liste de (consommateur, dossier, extensions)
+        index = {}
+        for name, (extensions, folders) in self._consumers.items():
+            for folder in folders or [None]:
+                key = "" if folder is None else f"{folder}/"
+                index.setdefault(key, []).append((name, folder, extensions))
+        return index
+
+    def run(self, container_client):
+        """
+        Exécute le listing et répartit les blobs entre les consommateurs.
+
+        Arguments:
+            container_client (ContainerClient): Client du conteneur à lister.
+
+        Retourne:
+            dict: Pour chaque consommateur, un dictionnaire dossier -> liste de BlobProperties
+                  (la clé est None pour un consommateur sans dossier ciblé).
+
+        Lève:
+            Exception: Si une erreur survient lors du listing.
+        """
+        index = self._build_index()
+        results = {
+            name: {folder: [] for folder in (folders or [None])}
+            for name, (_, folders) in self._consumers.items()
+        }
+        scanned = 0
+        try:
+            with metrics.timer("blob", "listing") as timer:
+                for prefix in self.prefixes():
+                    for blob in container_client.list_blobs(name_starts_with=prefix or None):
+                        scanned += 1
+                        # Dossiers parents du blob : "", "a/", "a/b/", ...
+                        candidate = ""
+                        candidates = [candidate]
+                        for part in blob.name.split("/")[:-1]:
+                            candidate = f"{candidate}{part}/"
+                            candidates.append(candidate)
+                        for candidate in candidates:
+                            for name, folder, extensions in index.get(candidate, ()):
+                                if blob.name.endswith(extensions):
+                                    results[name][folder].append(blob)
+                timer.add(items=scanned)
+        except Exception as e:
+            logging.error(f"Erreur lors du listing du conteneur : {e}")
+            raise
+        logging.info(f"Listing terminé : {scanned} blobs parcourus sur les préfixes {self.prefixes()}.")
+        return results
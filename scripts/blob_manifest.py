@@ -0,0 +1,115 @@
+import os
+import json
+import logging
+import threading
+
+
+class BlobManifest:
+    """
+    Manifeste local des blobs déjà synchronisés.
+
+    Pour chaque blob, le manifeste conserve son ETag, sa taille, sa date de dernière
+    modification et la liste des fichiers produits à partir de lui (téléchargement,
+    répertoire ou shards des images, conversions CSV, fichiers décompressés), ainsi que
+    le nombre d'images exportées. Un blob dont l'ETag et la taille n'ont pas changé et
+    dont toutes les sorties existent encore peut être ignoré : la vérification ne coûte
+    que quelques accès au système de fichiers par blob, quel que soit le nombre d'images.
+
+    Chaque enregistrement est aussi ajouté immédiatement à un journal (`<manifeste>.journal`),
+    rejoué au chargement : le manifeste sert ainsi de point de reprise, et une exécution
+    interrompue ne retraite pas les blobs terminés avant l'interruption.
+    """
+
+    def __init__(self, path):
+        """
+        Arguments:
+            path (str): Chemin du fichier JSON du manifeste.
+        """
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Manifeste illisible ({path}), synchronisation complète : {e}")
+                self.entries = {}
+        self._replay_journal()
+
+    def _replay_journal(self):
+        """
+        Applique les enregistrements d'une exécution interrompue avant la sauvegarde du manifeste.
+        """
+        if not os.path.exists(self.journal_path):
+            return
+        replayed = 0
+        with open(self.journal_path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Dernière ligne tronquée par l'interruption
+                    break
+                self.entries[record["name"]] = record["entry"]
+                replayed += 1
+        if replayed:
+            logging.info(f"{replayed} blob(s) repris du journal {self.journal_path}.")
+
+    def is_unchanged(self, blob):
+        """
+        Indique si un blob est identique à celui enregistré lors d'une exécution précédente.
+
+        Arguments:
+            blob (BlobProperties): Propriétés du blob issues du listing.
+
+        Retourne:
+            bool: True si le blob et toutes ses sorties sont à jour.
+        """
+        entry = self.entries.get(blob.name)
+        if entry is None:
+            return False
+        if entry.get("etag") != blob.etag or entry.get("size") != blob.size:
+            return False
+        return all(os.path.exists(path) for path in entry.get("outputs", []))
+
+    def record(self, blob, outputs, images=None):
+        """
+        Enregistre un blob traité avec succès et les fichiers qui en sont dérivés.
+
+        Arguments:
+            blob (BlobProperties): Propriétés du blob issues du listing.
+            outputs (list): Chemins des fichiers (ou répertoires) produits à partir du blob.
+            images (int): Nombre d'images exportées depuis le blob, s'il en contient.
+        """
+        entry = {
+            "etag": blob.etag,
+            "size": blob.size,
+            "last_modified": blob.last_modified.isoformat() if blob.last_modified else None,
+            "outputs": list(outputs),
+        }
+        if images is not None:
+            entry["images"] = images
+        with self._lock:
+            self.entries[blob.name] = entry
+            with open(self.journal_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"name": blob.name, "entry": entry}, ensure_ascii=False) + "\n")
+
+    def save(self):
+        """
+        Écrit le manifeste sur disque de manière atomique (fichier temporaire puis renommage)
+        et vide le journal.
+        """
+        temp_path = f"{self.path}.tmp"
+        with self._lock:
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(self.entries, file, indent=2, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            # Les enregistrements du journal sont désormais inclus dans le manifeste
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+        logging.info(f"Manifeste enregistré : {self.path} ({len(self.entries)} blobs)")
@@ -0,0 +1,136 @@
+import os
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from azure.core.credentials import AzureSasCredential
+from azure.storage.blob import generate_container_sas, ContainerSasPermissions
+
+from blob_download import create_container_client, DEFAULT_CHUNK_SIZE
+
+# Délai avant une nouvelle tentative lorsque le renouvellement du SAS échoue (secondes)
+RETRY_DELAY = 30
+
+
+class BlobSession:
+    """
+    Accès à un conteneur dont le SAS est renouvelé automatiquement avant son expiration.
+
+    Le SAS est porté par un `AzureSasCredential` partagé par tous les clients créés par
+    la session : un minuteur génère un nouveau SAS `refresh_margin` avant l'expiration
+    du précédent et met à jour le credential. Les requêtes en cours terminent avec
+    l'ancien SAS, encore valide ; les suivantes utilisent le nouveau, sans interruption.
+    """
+
+    def __init__(self, account_url, container_name, generate_sas, lifetime=timedelta(hours=1),
+                 refresh_margin=timedelta(minutes=10)):
+        """
+        Arguments:
+            account_url (str): URL du service Blob (ex : https://<compte>.blob.core.windows.net).
+            container_name (str): Nom du conteneur.
+            generate_sas (callable): Fonction recevant la date d'expiration et retournant un SAS.
+            lifetime (timedelta): Durée de validité de chaque SAS.
+            refresh_margin (timedelta): Avance du renouvellement sur l'expiration.
+        """
+        self.account_url = account_url.rstrip("/")
+        self.container_name = container_name
+        self.lifetime = lifetime
+        self.refresh_margin = min(refresh_margin, lifetime / 2)
+        self._generate_sas = generate_sas
+        self._lock = threading.Lock()
+        self._timer = None
+        self._closed = False
+        self.expires_at = datetime.now(timezone.utc) + lifetime
+        self.credential = AzureSasCredential(generate_sas(self.expires_at))
+        self._schedule((lifetime - self.refresh_margin).total_seconds())
+
+    @property
+    def container_url(self):
+        """
+        URL du conteneur, sans SAS (le SAS est fourni par le credential).
+        """
+        return f"{self.account_url}/{self.container_name}"
+
+    def container_client(self, max_workers=8, chunk_size=DEFAULT_CHUNK_SIZE, max_concurrency=4):
+        """
+        Crée un ContainerClient partagé dont les requêtes utilisent toujours le SAS courant.
+        """
+        return create_container_client(self.container_url, max_workers, chunk_size, max_concurrency,
+                                       credential=self.credential)
+
+    def refresh(self):
+        """
+        Génère un nouveau SAS et le substitue au précédent.
+        """
+        expires_at = datetime.now(timezone.utc) + self.lifetime
+        self.credential.update(self._generate_sas(expires_at))
+        self.expires_at = expires_at
+        logging.info(f"SAS du conteneur {self.container_name} renouvelé, valide jusqu'à {expires_at.isoformat()}.")
+
+    def _schedule(self, delay):
+        with self._lock:
+            if self._closed:
+                return
+            self._timer = threading.Timer(delay, self._refresh_and_reschedule)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _refresh_and_reschedule(self):
+        try:
+            self.refresh()
+            delay = (self.lifetime - self.refresh_margin).total_seconds()
+        except Exception as e:
+            # Le SAS courant reste valide jusqu'à son expiration : nouvelle tentative rapprochée
+            logging.error(f"Erreur lors du renouvellement du SAS : {e}")
+            delay = RETRY_DELAY
+        self._schedule(delay)
+
+    def close(self):
+        """
+        Arrête le renouvellement automatique du SAS.
+        """
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Crée une session à partir des variables ACCOUNT_NAME, ACCOUNT_KEY, CONTAINER_NAME et
+        BLOB_ENDPOINT, avec un SAS en lecture et liste de SAS_LIFETIME_MINUTES minutes,
+        renouvelé SAS_REFRESH_MARGIN_MINUTES minutes avant son expiration.
+
+        Lève:
+            ValueError: Si une variable d'environnement nécessaire est absente.
+        """
+        account_name = os.getenv("ACCOUNT_NAME")
+        account_key = os.getenv("ACCOUNT_KEY")
+        container_name = os.getenv("CONTAINER_NAME")
+        if not all([account_name, account_key, container_name]):
+            raise ValueError("Les variables d'environnement ACCOUNT_NAME, ACCOUNT_KEY ou CONTAINER_NAME ne sont pas définies.")
+
+        def generate_sas(expiry):
+            return generate_container_sas(
+                account_name=account_name,
+                account_key=account_key,
+                container_name=container_name,
+                permission=ContainerSasPermissions(read=True, list=True),
+                # Début légèrement antérieur pour tolérer un décalage d'horloge avec le service
+                start=datetime.now(timezone.utc) - timedelta(minutes=5),
+                expiry=expiry,
+            )
+
+        return cls(
+            os.getenv("BLOB_ENDPOINT", f"https://{account_name}.blob.core.windows.net"),
+            container_name,
+            generate_sas,
+            lifetime=timedelta(minutes=float(os.getenv("SAS_LIFETIME_MINUTES", "60"))),
+            refresh_margin=timedelta(minutes=float(os.getenv("SAS_REFRESH_MARGIN_MINUTES", "10"))),
+        )
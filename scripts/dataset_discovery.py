@@ -0,0 +1,78 @@
+import os
+import re
+
+# Extensions des fichiers de données produits par les extracteurs
+DATA_EXTENSIONS = (".csv", ".parquet")
+
+# Dossiers de ./data qui ne contiennent pas de jeux de données « bruts » du conteneur
+RESERVED_FOLDERS = {"azure", "parquet"}
+
+
+def dataset_name(relative_path):
+    """
+    Construit un nom de vue à partir du chemin relatif d'un fichier (sans extension).
+
+    Ex : "sous_dossier/Mon fichier.csv" -> "sous_dossier_mon_fichier".
+    """
+    stem = os.path.splitext(relative_path)[0]
+    return re.sub(r"[^0-9a-zA-Z_]+", "_", stem).strip("_").lower() or "dataset"
+
+
+def is_data_file(file_name):
+    """
+    Indique si un fichier est une sortie finale d'extraction (et non un fichier temporaire,
+    partiel ou un delta en cours de fusion).
+    """
+    return file_name.endswith(DATA_EXTENSIONS) and ".part-" not in file_name and ".delta" not in file_name
+
+
+def discover_datasets(data_dir="./data"):
+    """
+    Recense les jeux de données produits par les trois extracteurs.
+
+    - `data/azure/<schéma>/<table>.csv|.parquet` -> vue `<schéma>.<table>` ;
+    - `data/parquet/data/<fichier>` -> vue `parquet.<fichier>` ;
+    - `data/<dossier>/**/<fichier>` -> vue `<dossier>.<chemin_relatif>`.
+
+    Arguments:
+        data_dir (str): Répertoire racine des données extraites.
+
+    Retourne:
+        list: Dictionnaires (schema, name, path, format), triés par schéma puis par nom.
+    """
+    datasets = []
+
+    def add_files(schema, root, recursive):
+        if not os.path.isdir(root):
+            return
+        for current, folders, files in os.walk(root):
+            folders[:] = sorted(folder for folder in folders if not folder.startswith(".")) if recursive else []
+            for file_name in sorted(files):
+                if not is_data_file(file_name):
+                    continue
+                path = os.path.join(current, file_name)
+                datasets.append({
+                    "schema": schema,
+                    "name": dataset_name(os.path.relpath(path, root)) if recursive else os.path.splitext(file_name)[0],
+                    "path": os.path.abspath(path),
+                    "format": os.path.splitext(file_name)[1].lstrip("."),
+                })
+
+    # Tables SQL Server : un schéma DuckDB par schéma source, avec le nom d'origine des tables
+    azure_dir = os.path.join(data_dir, "azure")
+    if os.path.isdir(azure_dir):
+        for schema in sorted(os.listdir(azure_dir)):
+            if not schema.startswith("."):
+                add_files(schema, os.path.join(azure_dir, schema), recursive=False)
+
+    # Données textuelles des fichiers Parquet du conteneur
+    add_files("parquet", os.path.join(data_dir, "parquet", "data"), recursive=False)
+
+    # Fichiers CSV/ZIP du conteneur, un schéma par dossier
+    if os.path.isdir(data_dir):
+        for folder in sorted(os.listdir(data_dir)):
+            if folder in RESERVED_FOLDERS or folder.startswith("."):
+                continue
+            add_files(dataset_name(folder), os.path.join(data_dir, folder), recursive=True)
+
+    return datasets
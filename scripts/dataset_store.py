@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+import metrics
+import log_setup
+from dataset_discovery import discover_datasets
+
+# Répertoire des jeux de données publiés au format Arrow IPC (ignoré par le recensement de ./data)
+STORE_DIR = os.getenv("DATASET_STORE_DIR", "./data/.arrow")
+
+# Manifeste des jeux de données publiés
+MANIFEST_NAME = "manifest.json"
+
+# Formats de chargement proposés par `load_dataset`
+LOAD_FORMATS = ("arrow", "pandas", "polars")
+
+
+def _read_batches(dataset):
+    """
+    Lit un jeu de données source (CSV ou Parquet) lot par lot.
+
+    Retourne:
+        tuple: (schéma Arrow, itérateur de RecordBatch).
+    """
+    if dataset["format"] == "parquet":
+        parquet_file = pq.ParquetFile(dataset["path"])
+        return parquet_file.schema_arrow, parquet_file.iter_batches()
+    reader = pa_csv.open_csv(dataset["path"])
+    return reader.schema, reader
+
+
+def _write_ipc(schema, batches, path):
+    """
+    Écrit des lots dans un fichier Arrow IPC non compressé (condition de la lecture sans copie),
+    via un fichier temporaire renommé une fois complet.
+
+    Retourne:
+        int: Nombre de lignes écrites.
+    """
+    temp_path = f"{path}.tmp"
+    rows = 0
+    try:
+        with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        # Un lecteur qui a déjà projeté l'ancien fichier en mémoire continue de le lire jusqu'à sa fermeture
+        os.replace(temp_path, path)
+        return rows
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def publish_dataset(dataset, store_dir=STORE_DIR):
+    """
+    Publie un jeu de données extrait au format Arrow IPC.
+
+    Les types sont ceux du fichier Parquet source, ou déduits par pyarrow pour un CSV ;
+    si un bloc ultérieur d'un CSV contredit les types déduits, il est relu en texte.
+
+    Arguments:
+        dataset (dict): Jeu de données issu de `discover_datasets`.
+        store_dir (str): Répertoire du magasin.
+
+    Retourne:
+        dict: Entrée du manifeste (fichier, source, nombre de lignes, schéma).
+    """
+    relative_path = os.path.join(dataset["schema"], f"{dataset['name']}.arrow")
+    path = os.path.join(store_dir, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    schema, batches = _read_batches(dataset)
+    try:
+        rows = _write_ipc(schema, batches, path)
+    except pa.ArrowInvalid:
+        if dataset["format"] == "parquet":
+            raise
+        column_types = {name: pa.string() for name in schema.names}
+        reader = pa_csv.open_csv(dataset["path"], convert_options=pa_csv.ConvertOptions(column_types=column_types))
+        schema = reader.schema
+        rows = _write_ipc(schema, reader, path)
+
+    stat = os.stat(dataset["path"])
+    return {
+        "path": relative_path,
+        "source": dataset["path"],
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "rows": rows,
+        "columns": [{"name": field.name, "type": str(field.type)} for field in schema],
+        "published_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def read_manifest(store_dir=STORE_DIR):
+    """
+    Retourne le manifeste du magasin : "schéma.nom" -> entrée ({} si rien n'a été publié).
+    """
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _write_manifest(manifest, store_dir):
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def is_up_to_date(entry, dataset, store_dir=STORE_DIR):
+    """
+    Indique si la publication d'un jeu de données correspond encore à son fichier source.
+    """
+    if entry is None or entry["source"] != dataset["path"]:
+        return False
+    if not os.path.exists(os.path.join(store_dir, entry["path"])):
+        return False
+    stat = os.stat(dataset["path"])
+    return entry["source_size"] == stat.st_size and entry["source_mtime_ns"] == stat.st_mtime_ns
+
+
+def publish_datasets(datasets, store_dir=STORE_DIR, force=False):
+    """
+    Publie les jeux de données modifiés depuis la publication précédente et retire ceux
+    qui ont disparu, puis met à jour le manifeste.
+
+    Arguments:
+        datasets (list): Jeux de données issus de `discover_datasets`.
+        store_dir (str): Répertoire du magasin.
+        force (bool): Republie tous les jeux de données.
+
+    Retourne:
+        dict: Erreurs de publication par "schéma.nom".
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    previous = read_manifest(store_dir)
+    manifest = {}
+    errors = {}
+    for dataset in datasets:
+        key = f"{dataset['schema']}.{dataset['name']}"
+        entry = previous.get(key)
+        if not force and is_up_to_date(entry, dataset, store_dir):
+            manifest[key] = entry
+            continue
+        start = time.perf_counter()
+        try:
+            with metrics.timer("arrow", "publish", key) as timer:
+                manifest[key] = publish_dataset(dataset, store_dir)
+                timer.add(bytes=os.path.getsize(os.path.join(store_dir, manifest[key]["path"])),
+                          rows=manifest[key]["rows"])
+            logging.info(f"Jeu de données {key} publié ({manifest[key]['rows']} lignes) en {time.perf_counter() - start:.2f} s")
+        except (OSError, pa.ArrowException) as e:
+            errors[key] = e
+            logging.error(f"Erreur lors de la publication de {dataset['path']} : {e}")
+            if entry is not None:
+                # L'ancienne publication reste disponible
+                manifest[key] = entry
+
+    # Fichiers des jeux de données disparus depuis la publication précédente
+    for key, entry in previous.items():
+        if key not in manifest:
+            path = os.path.join(store_dir, entry["path"])
+            if os.path.exists(path):
+                os.remove(path)
+            logging.info(f"Jeu de données retiré du magasin : {key}")
+
+    _write_manifest(manifest, store_dir)
+    return errors
+
+
+def list_datasets(store_dir=STORE_DIR):
+    """
+    Retourne les noms des jeux de données publiés ("schéma.nom"), triés.
+    """
+    return sorted(read_manifest(store_dir))
+
+
+def load_dataset(name, as_="arrow", columns=None, store_dir=STORE_DIR):
+    """
+    Charge un jeu de données publié sans copie : le fichier Arrow IPC est projeté en mémoire
+    et les colonnes retournées référencent directement ses pages.
+
+    Plusieurs processus qui chargent le même jeu de données partagent ainsi une seule copie
+    en cache du système, et seules les pages effectivement lues sont chargées depuis le disque.
+
+        table = load_dataset("Sales.SalesOrderHeader")
+        frame = load_dataset("Sales.SalesOrderHeader", as_="polars", columns=["SalesOrderID", "TotalDue"])
+
+    Arguments:
+        name (str): Nom du jeu de données ("schéma.nom", voir `list_datasets`).
+        as_ (str): "arrow" (pyarrow.Table), "pandas" (DataFrame à types Arrow) ou "polars".
+        columns (list): Colonnes à charger ; toutes par défaut.
+        store_dir (str): Répertoire du magasin.
+
+    Lève:
+        KeyError: Si le jeu de données n'a pas été publié.
+        ValueError: Si le format demandé n'est pas pris en charge.
+    """
+    if as_ not in LOAD_FORMATS:
+        raise ValueError(f"Format de chargement non pris en charge : {as_} (attendu : {', '.join(LOAD_FORMATS)})")
+    manifest = read_manifest(store_dir)
+    if name not in manifest:
+        raise KeyError(f"Jeu de données inconnu : {name} (publiés : {', '.join(sorted(manifest)) or 'aucun'})")
+
+    source = pa.memory_map(os.path.join(store_dir, manifest[name]["path"]), "r")
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+
+    if as_ == "pandas":
+        import pandas as pd
+        # Colonnes pandas adossées aux tableaux Arrow : ni conversion ni copie, y compris pour le texte
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    if as_ == "polars":
+        import polars as pl
+        return pl.from_arrow(table, rechunk=False)
+    return table
+
+
+def main(argv=None):
+    """
+    Point d'entrée en ligne de commande :
+
+        python scripts/dataset_store.py publish [--force]
+        python scripts/dataset_store.py list
+
+    Retourne:
+        int: Code de sortie (0 en cas de succès).
+    """
+    parser = argparse.ArgumentParser(description="Magasin Arrow IPC des données extraites.")
+    parser.add_argument("--store-dir", default=os.getenv("DATASET_STORE_DIR", STORE_DIR),
+                        help="Répertoire du magasin (DATASET_STORE_DIR)")
+    parser.add_argument("--data-dir", default="./data", help="Répertoire des données extraites")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    publish_parser = subparsers.add_parser("publish", help="Publie les jeux de données extraits")
+    publish_parser.add_argument("--force", action="store_true", help="Republie aussi les jeux de données inchangés")
+    subparsers.add_parser("list", help="Liste les jeux de données publiés")
+    args = parser.parse_args(argv)
+
+    if args.command == "publish":
+        datasets = discover_datasets(args.data_dir)
+        errors = publish_datasets(datasets, args.store_dir, args.force)
+        print(f"{len(datasets) - len(errors)} jeu(x) de données publié(s) dans {args.store_dir}, {len(errors)} en échec.")
+        return 1 if errors else 0
+
+    for name, entry in sorted(read_manifest(args.store_dir).items()):
+        print(f"{name:<50}{entry['rows']:>12} lignes  {entry['path']}")
+    return 0
+
+
+if __name__ == "__main__":
+    # Chargement des variables d'environnement depuis un fichier .env
+    load_dotenv()
+
+    # Configuration de la journalisation (au lancement seulement : un traitement qui importe
+    # `load_dataset` conserve sa propre configuration)
+    log_setup.configure("./logs/dataset_store.log")
+    try:
+        sys.exit(main())
+    finally:
+        metrics.write_report("arrow")
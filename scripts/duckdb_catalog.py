@@ -0,0 +1,212 @@
+import os
+import sys
+import time
+import logging
+import argparse
+
+import duckdb
+from dotenv import load_dotenv
+
+import log_setup
+from dataset_discovery import discover_datasets
+
+# Chargement des variables d'environnement depuis un fichier .env
+load_dotenv()
+
+# Configuration de la journalisation (sans effet si le pipeline l'a déjà configurée)
+log_setup.configure("./logs/duckdb_catalog.log")
+
+# Table décrivant les jeux de données enregistrés
+CATALOG_TABLE = "main._datasets"
+
+
+def quote_identifier(name):
+    """
+    Protège un identifiant DuckDB (schéma, vue, table) par des guillemets doubles.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value):
+    """
+    Protège une chaîne littérale SQL par des apostrophes.
+    """
+    return "'" + value.replace("'", "''") + "'"
+
+
+def source_query(dataset):
+    """
+    Retourne la requête de lecture directe d'un fichier par DuckDB.
+    """
+    if dataset["format"] == "parquet":
+        return f"SELECT * FROM read_parquet({quote_literal(dataset['path'])})"
+    return f"SELECT * FROM read_csv_auto({quote_literal(dataset['path'])}, header=true)"
+
+
+def connect(database_path, read_only=False):
+    """
+    Ouvre la base DuckDB du catalogue et applique les réglages DUCKDB_THREADS et DUCKDB_MEMORY_LIMIT.
+    """
+    if not read_only:
+        os.makedirs(os.path.dirname(os.path.abspath(database_path)), exist_ok=True)
+    connection = duckdb.connect(database_path, read_only=read_only)
+    threads = int(os.getenv("DUCKDB_THREADS", "0"))
+    if threads:
+        connection.execute(f"SET threads = {threads}")
+    memory_limit = os.getenv("DUCKDB_MEMORY_LIMIT")
+    if memory_limit:
+        connection.execute(f"SET memory_limit = {quote_literal(memory_limit)}")
+    return connection
+
+
+def register_datasets(connection, datasets, materialize=False):
+    """
+    Enregistre les jeux de données dans la base DuckDB, sous forme de vues ou de tables.
+
+    Une vue relit le fichier à chaque requête (toujours à jour, aucun stockage
+    supplémentaire) ; une table matérialisée copie les données dans le format
+    colonnaire compressé de DuckDB, pour des requêtes répétées plus rapides. Les
+    objets des jeux de données disparus depuis l'enregistrement précédent sont supprimés.
+
+    Arguments:
+        connection (duckdb.DuckDBPyConnection): Connexion à la base du catalogue.
+        datasets (list): Jeux de données issus de `discover_datasets`.
+        materialize (bool): Crée des tables plutôt que des vues.
+
+    Retourne:
+        dict: Erreurs d'enregistrement par "schéma.nom".
+    """
+    connection.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} (
+            schema_name VARCHAR, name VARCHAR, path VARCHAR, format VARCHAR,
+            materialized BOOLEAN, registered_at TIMESTAMP
+        )
+    """)
+
+    # Supprime les objets enregistrés précédemment dont le fichier n'est plus recensé,
+    # ou qui change de type (vue <-> table)
+    current = {(dataset["schema"], dataset["name"]) for dataset in datasets}
+    for schema, name, materialized in connection.execute(
+        f"SELECT schema_name, name, materialized FROM {CATALOG_TABLE}"
+    ).fetchall():
+        if (schema, name) not in current or materialized != materialize:
+            kind = "TABLE" if materialized else "VIEW"
+            connection.execute(f"DROP {kind} IF EXISTS {quote_identifier(schema)}.{quote_identifier(name)}")
+            if (schema, name) not in current:
+                logging.info(f"Jeu de données retiré du catalogue : {schema}.{name}")
+
+    errors = {}
+    for dataset in datasets:
+        schema, name = dataset["schema"], dataset["name"]
+        target = f"{quote_identifier(schema)}.{quote_identifier(name)}"
+        start = time.perf_counter()
+        try:
+            connection.execute(f"CREATE SCHEMA IF NOT EXISTS {quote_identifier(schema)}")
+            kind = "TABLE" if materialize else "VIEW"
+            connection.execute(f"CREATE OR REPLACE {kind} {target} AS {source_query(dataset)}")
+            logging.info(f"{kind} {schema}.{name} enregistrée depuis {dataset['path']} en {time.perf_counter() - start:.2f} s")
+        except duckdb.Error as e:
+            errors[f"{schema}.{name}"] = e
+            logging.error(f"Erreur lors de l'enregistrement de {dataset['path']} : {e}")
+
+    registered = [dataset for dataset in datasets if f"{dataset['schema']}.{dataset['name']}" not in errors]
+    connection.execute(f"DELETE FROM {CATALOG_TABLE}")
+    if registered:
+        connection.executemany(
+            f"INSERT INTO {CATALOG_TABLE} VALUES (?, ?, ?, ?, ?, current_timestamp)",
+            [[d["schema"], d["name"], d["path"], d["format"], materialize] for d in registered],
+        )
+    return errors
+
+
+def run_query(connection, query, output=None):
+    """
+    Exécute une requête analytique et affiche le résultat, ou l'écrit dans un fichier
+    CSV ou Parquet selon l'extension de `output`.
+    """
+    start = time.perf_counter()
+    if output:
+        options = "(FORMAT PARQUET)" if output.endswith(".parquet") else "(FORMAT CSV, HEADER)"
+        connection.execute(f"COPY ({query}) TO {quote_literal(output)} {options}")
+        print(f"Résultat écrit dans {output} en {time.perf_counter() - start:.2f} s")
+    else:
+        connection.sql(query).show()
+        print(f"Requête exécutée en {time.perf_counter() - start:.2f} s")
+
+
+def main(argv=None):
+    """
+    Point d'entrée en ligne de commande :
+
+        python scripts/duckdb_catalog.py register [--materialize]
+        python scripts/duckdb_catalog.py list
+        python scripts/duckdb_catalog.py query "SELECT * FROM Sales.SalesOrderHeader LIMIT 10"
+        python scripts/duckdb_catalog.py query -f requete.sql -o resultat.parquet
+
+    Retourne:
+        int: Code de sortie (0 en cas de succès).
+    """
+    parser = argparse.ArgumentParser(description="Catalogue DuckDB des données extraites.")
+    parser.add_argument("--database", default=os.getenv("DUCKDB_PATH", "./data/catalog.duckdb"),
+                        help="Fichier de la base DuckDB (DUCKDB_PATH)")
+    parser.add_argument("--data-dir", default="./data", help="Répertoire des données extraites")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    register_parser = subparsers.add_parser("register", help="Enregistre les jeux de données extraits")
+    register_parser.add_argument("--materialize", action="store_true",
+                                 default=os.getenv("DUCKDB_MATERIALIZE", "0") == "1",
+                                 help="Crée des tables au lieu de vues (DUCKDB_MATERIALIZE=1)")
+
+    subparsers.add_parser("list", help="Liste les jeux de données enregistrés")
+
+    query_parser = subparsers.add_parser("query", help="Exécute une requête SQL sur le catalogue")
+    query_parser.add_argument("sql", nargs="?", help="Requête SQL")
+    query_parser.add_argument("-f", "--file", help="Fichier contenant la requête SQL")
+    query_parser.add_argument("-o", "--output", help="Écrit le résultat dans un fichier .csv ou .parquet")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "register":
+        datasets = discover_datasets(args.data_dir)
+        connection = connect(args.database)
+        try:
+            errors = register_datasets(connection, datasets, args.materialize)
+        finally:
+            connection.close()
+        kind = "tables" if args.materialize else "vues"
+        print(f"{len(datasets) - len(errors)} jeu(x) de données enregistré(s) en {kind} dans {args.database}, {len(errors)} en échec.")
+        return 1 if errors else 0
+
+    # Une base ouverte en lecture seule n'est pas créée : le catalogue doit avoir été construit
+    if not os.path.exists(args.database):
+        message = (f"Catalogue DuckDB introuvable ({args.database}) : lancez d'abord "
+                   "`python scripts/duckdb_catalog.py register` (ou l'étape catalog du pipeline).")
+        logging.error(message)
+        print(f"Erreur : {message}")
+        return 1
+
+    connection = connect(args.database, read_only=True)
+    try:
+        if args.command == "list":
+            run_query(connection, f"SELECT schema_name, name, format, materialized, path FROM {CATALOG_TABLE} ORDER BY schema_name, name")
+            return 0
+
+        if args.file:
+            with open(args.file, "r", encoding="utf-8") as file:
+                query = file.read()
+        else:
+            query = args.sql
+        if not query:
+            parser.error("une requête SQL ou un fichier (-f) est requis")
+        run_query(connection, query.strip().rstrip(";"), args.output)
+        return 0
+    except duckdb.Error as e:
+        logging.error(f"Erreur lors de l'exécution de la requête : {e}")
+        print(f"Erreur : {e}")
+        return 1
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,145 +1,292 @@
 import os
+import sys
 import logging
-from azure.storage.blob import ContainerClient, generate_container_sas, ContainerSasPermissions
-from tqdm import tqdm
-from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import zipfile
-import io
-import pandas as pd
+import shutil
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from blob_download import create_container_client, download_blobs
+from blob_cache import fetch_blob
+from blob_manifest import BlobManifest
+from blob_listing import BlobListing
+from blob_file import BlobRangeFile
+from blob_session import BlobSession
+from output_sink import get_output_format
+from transform_engine import get_engine, requires_rewrite, transform_csv
+import metrics
+import log_setup
 
 # Charger les variables d'environnement
 load_dotenv()
 
-# Configuration des logs
-logging.basicConfig(filename="logs/extract_csv.log", level=logging.INFO, 
-                    format="%(asctime)s - %(levelname)s - %(message)s")
+# Configuration des logs (écriture asynchrone ; sans effet si le pipeline l'a déjà configurée)
+log_setup.configure("logs/extract_csv.log")
 
-def generate_sas_token(account_name, account_key, container_name):
-    try:
-        # Génération du SAS token
-        sas_token = generate_container_sas(
-            account_name=account_name,
-            account_key=account_key,
-            container_name=container_name,
-            permission=ContainerSasPermissions(read=True, list=True),
-            expiry=datetime.now(timezone.utc) + timedelta(hours=1)
-        )
-        return sas_token
-    except Exception as e:
-        logging.error(f"Erreur SAS : {e}")
-        raise
-
-def generate_sas_url():
-    account_name = os.getenv("ACCOUNT_NAME")
-    account_key = os.getenv("ACCOUNT_KEY")
-    container_name = os.getenv("CONTAINER_NAME")
-
-    # Vérification des variables d'environnement
-    if not all([account_name, account_key, container_name]):
-        raise ValueError("Les variables d'environnement ACCOUNT_NAME, ACCOUNT_KEY ou CONTAINER_NAME ne sont pas définies.")
+# Dossiers spécifiques à examiner
+TARGET_FOLDERS = ["nlp_data", "machine_learning"]
 
-    sas_token = generate_sas_token(account_name, account_key, container_name)
-    return f"https://{account_name}.blob.core.windows.net/{container_name}?{sas_token}"
+# Extensions des fichiers à rechercher
+EXTENSIONS = [".csv", ".zip"]
 
-def list_files_from_specific_folders(container_url, folders, extensions):
+def list_files_from_specific_folders(container_client, folders, extensions):
     """
     Liste les fichiers avec des extensions spécifiques dans des dossiers spécifiques d'un conteneur Azure Blob Storage.
+    Seuls les préfixes des dossiers ciblés sont listés côté serveur.
+    Retourne, pour chaque dossier, les propriétés des blobs (nom, ETag, taille, date de modification).
     """
-    try:
-        container_client = ContainerClient.from_container_url(container_url)
-        blobs = container_client.list_blobs()
-        files = {folder: [] for folder in folders}  # Dictionnaire pour stocker les fichiers par dossier
-
-        for blob in blobs:
-            for folder in folders:
-                if blob.name.startswith(folder + "/") and any(blob.name.endswith(ext) for ext in extensions):
-                    files[folder].append(blob.name)  # Ajoute au dossier correspondant
-        return files
-    except Exception as e:
-        logging.error(f"Erreur lors de la liste des fichiers : {e}")
-        raise
+    listing = BlobListing()
+    listing.add_consumer("csv", extensions, folders)
+    return listing.run(container_client)["csv"]
 
-def download_file(container_url, blob_name, download_dir):
+def download_file(container_client, blob_name, download_dir, max_concurrency=4, etag=None, size=None,
+                  content_md5=None):
     """
     Télécharge un fichier depuis Azure Blob Storage vers un répertoire local.
+    Le ContainerClient est partagé entre les appels pour réutiliser ses connexions HTTP,
+    et le contenu est écrit segment par segment sans être chargé entièrement en mémoire.
+    Un téléchargement interrompu reprend au dernier octet validé (ETag et taille issus du listing).
+    Un contenu déjà présent dans le cache local des blobs n'est pas retéléchargé.
     """
     try:
-        container_client = ContainerClient.from_container_url(container_url)
         blob_client = container_client.get_blob_client(blob_name)
 
         # Chemin complet pour sauvegarder le fichier
         file_path = os.path.join(download_dir, os.path.basename(blob_name))
-        os.makedirs(download_dir, exist_ok=True)  # Crée le répertoire si nécessaire
 
-        with open(file_path, "wb") as file:
-            file.write(blob_client.download_blob().readall())
+        downloaded = fetch_blob(blob_client, file_path, max_concurrency=max_concurrency, stage="csv", etag=etag,
+                                size=size, content_md5=content_md5)
 
-        logging.info(f"Fichier téléchargé : {blob_name} -> {file_path}")
-        print(f"Fichier téléchargé : {file_path}")
+        # Un résumé périodique plutôt qu'une ligne par fichier
+        log_setup.item_log("Fichiers téléchargés").record(blob_name, bytes=downloaded)
         return file_path
     except Exception as e:
         logging.error(f"Erreur lors du téléchargement de {blob_name}: {e}")
         raise
 
-def unzip_and_process_zip(zip_path, target_folder):
+def resolve_member_path(target_folder, member_name):
+    """
+    Calcule le chemin de sortie d'un membre d'archive en refusant les chemins
+    qui sortiraient du dossier cible (noms absolus ou contenant "..").
+    """
+    root = os.path.abspath(target_folder)
+    path = os.path.abspath(os.path.join(root, member_name))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Chemin de membre ZIP invalide : {member_name}")
+    return path
+
+def extract_zip_member(open_archive, member_name, target_folder, normalize=False, chunksize=100000,
+                       output_format="csv"):
+    """
+    Écrit un membre d'archive ZIP sur disque en le lisant en flux, sans extraction intermédiaire.
+
+    Les CSV sont copiés octet pour octet, ou relus et réécrits par le moteur de
+    transformation (TRANSFORM_ENGINE) lorsque `normalize` est activé, qu'un
+    ré-encodage ou un dédoublonnage est demandé, ou avec le format "parquet"
+    (Parquet typé). La sortie est écrite dans un fichier temporaire renommé une
+    fois complet.
+
+    Arguments:
+        open_archive (callable): Fonction retournant un objet fichier positionnable contenant l'archive.
+        member_name (str): Nom du membre dans l'archive.
+        target_folder (str): Dossier de destination.
+        normalize (bool): Relit et réécrit les CSV (séparateurs, guillemets, fins de ligne).
+        chunksize (int): Nombre de lignes par bloc lors de la normalisation avec pandas.
+        output_format (str): Format de sortie des CSV ("csv" ou "parquet").
+
+    Retourne:
+        str: Chemin du fichier écrit.
+    """
+    output_path = resolve_member_path(target_folder, member_name)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    if member_name.endswith(".csv") and (normalize or output_format == "parquet" or requires_rewrite()):
+        @contextmanager
+        def open_member():
+            with open_archive() as archive, zipfile.ZipFile(archive, "r") as zip_ref, zip_ref.open(member_name) as member:
+                yield member
+
+        with metrics.timer("csv", "unzip", member_name) as timer:
+            path, rows = transform_csv(open_member, output_path[:-len(".csv")], output_format, chunksize=chunksize)
+            timer.add(bytes=os.path.getsize(path), rows=rows)
+        return path
+
+    temp_path = f"{output_path}.tmp"
+    try:
+        with metrics.timer("csv", "unzip", member_name) as timer, open_archive() as archive, \
+                zipfile.ZipFile(archive, "r") as zip_ref, zip_ref.open(member_name) as member, \
+                open(temp_path, "wb") as output:
+            shutil.copyfileobj(member, output, 1024 * 1024)
+            timer.add(bytes=os.path.getsize(temp_path))
+        os.replace(temp_path, output_path)
+        return output_path
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def unzip_and_process_zip(zip_source, target_folder, normalize=False, chunksize=100000, max_workers=4,
+                          output_format="csv"):
     """
     Décompresse un fichier .zip et traite les fichiers .csv à l'intérieur.
+
+    Chaque membre est lu en flux depuis l'archive et écrit directement à sa place
+    finale ; plusieurs membres sont traités en parallèle, chacun avec son propre
+    descripteur d'archive. L'archive peut être un fichier local ou une fonction
+    d'ouverture (par exemple une lecture par plages d'un blob encore distant).
+    Retourne la liste des fichiers extraits.
     """
+    open_archive = zip_source if callable(zip_source) else (lambda: open(zip_source, "rb"))
     try:
-        # Ouvrir le fichier zip
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(target_folder)  # Extraire tous les fichiers dans le dossier cible
-
-            # Liste des fichiers extraits
-            extracted_files = zip_ref.namelist()
-            for file_name in extracted_files:
-                if file_name.endswith('.csv'):
-                    # Lire et traiter les fichiers CSV extraits
-                    csv_file_path = os.path.join(target_folder, file_name)
-                    df = pd.read_csv(csv_file_path)
-                    csv_output_path = os.path.join(target_folder, file_name)
-
-                    # Sauvegarder ou manipuler le fichier CSV comme vous le souhaitez
-                    df.to_csv(csv_output_path, index=False)
-                    logging.info(f"CSV extrait et sauvegardé : {csv_output_path}")
-                    print(f"CSV extrait et sauvegardé : {csv_output_path}")
-                else:
-                    logging.info(f"Fichier ignoré (non CSV) : {file_name}")
+        with open_archive() as archive, zipfile.ZipFile(archive, "r") as zip_ref:
+            members = [name for name in zip_ref.namelist() if not name.endswith("/")]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            extracted_paths = list(executor.map(
+                lambda name: extract_zip_member(open_archive, name, target_folder, normalize, chunksize, output_format),
+                members,
+            ))
+
+        csv_count = sum(1 for name in members if name.endswith(".csv"))
+        logging.info(
+            f"Archive traitée vers {target_folder} : {csv_count} CSV et {len(members) - csv_count} autre(s) fichier(s) extraits."
+        )
+        return extracted_paths
     except Exception as e:
         logging.error(f"Erreur lors de la décompression du fichier ZIP : {e}")
         raise
 
-if __name__ == "__main__":
-    try:
-        # URL du conteneur Azure Blob
-        container_url = generate_sas_url()
+def convert_csv_file(csv_path, output_format):
+    """
+    Convertit un CSV téléchargé dans le format de sortie demandé et supprime le CSV d'origine.
+    Au format "csv", le fichier n'est réécrit (en place) que si un ré-encodage ou un
+    dédoublonnage est demandé. Retourne le chemin du fichier produit.
+    """
+    if output_format == "csv" and not requires_rewrite():
+        return csv_path
+    with metrics.timer("csv", "write", csv_path) as timer:
+        path, rows = transform_csv(
+            lambda: open(csv_path, "rb"), csv_path[:-len(".csv")], output_format, source_path=csv_path
+        )
+        timer.add(bytes=os.path.getsize(path), rows=rows)
+    if path != csv_path:
+        os.remove(csv_path)
+    log_setup.item_log("CSV convertis").record(path, rows=rows)
+    return path
+
+def main(files_by_folder=None, container_url=None, session=None):
+    """
+    Télécharge et traite les fichiers CSV et ZIP des dossiers ciblés.
+
+    Arguments:
+        files_by_folder (dict): Résultat d'un listing déjà effectué (dossier -> BlobProperties),
+                                par exemple par une passe de listing partagée ; listé ici si absent.
+        container_url (str): URL du conteneur avec un SAS fixe ; prioritaire sur `session`.
+        session (BlobSession): Session à SAS renouvelé ; créée depuis l'environnement si
+                               ni `container_url` ni `session` ne sont fournis.
+    """
+    # Nombre de téléchargements simultanés et de tentatives par blob
+    max_workers = int(os.getenv("BLOB_MAX_WORKERS", "8"))
+    max_retries = int(os.getenv("BLOB_MAX_RETRIES", "3"))
+
+    # Taille des segments téléchargés et nombre de plages parallèles par blob
+    chunk_size = int(os.getenv("BLOB_CHUNK_SIZE", str(4 * 1024 * 1024)))
+    max_concurrency = int(os.getenv("BLOB_MAX_CONCURRENCY", "4"))
 
-        # Dossiers spécifiques à examiner
-        target_folders = ["nlp_data", "machine_learning"]
+    # Client unique partagé par tous les téléchargements ; sans URL fournie, le SAS est
+    # renouvelé automatiquement avant son expiration pendant toute la durée de l'exécution
+    own_session = container_url is None and session is None
+    if own_session:
+        session = BlobSession.from_env()
+    if container_url:
+        container_client = create_container_client(container_url, max_workers, chunk_size, max_concurrency)
+    else:
+        container_client = session.container_client(max_workers, chunk_size, max_concurrency)
 
-        # Extensions des fichiers à rechercher
-        extensions = [".csv", ".zip"]
+    # Liste des fichiers par dossier et extension
+    if files_by_folder is None:
+        print(f"Recherche des fichiers {EXTENSIONS} dans les dossiers : {TARGET_FOLDERS}...")
+        files_by_folder = list_files_from_specific_folders(container_client, TARGET_FOLDERS, EXTENSIONS)
+    failed_files = {}
 
-        print(f"Recherche des fichiers {extensions} dans les dossiers : {target_folders}...")
+    # Manifeste des blobs déjà synchronisés (BLOB_FULL_SYNC=1 force un retéléchargement complet)
+    manifest = BlobManifest(os.path.join("data", ".manifests", "csv.json"))
+    full_sync = os.getenv("BLOB_FULL_SYNC", "0") == "1"
 
-        # Liste des fichiers par dossier et extension
-        files_by_folder = list_files_from_specific_folders(container_url, target_folders, extensions)
+    # Traitement des archives ZIP : normalisation des CSV, parallélisme et lecture distante sans téléchargement
+    zip_normalize = os.getenv("ZIP_NORMALIZE_CSV", "0") == "1"
+    zip_chunksize = int(os.getenv("ZIP_CSV_CHUNKSIZE", "100000"))
+    zip_workers = int(os.getenv("ZIP_MAX_WORKERS", "4"))
+    zip_remote_read = os.getenv("ZIP_REMOTE_READ", "0") == "1"
 
-        # Téléchargement des fichiers pour chaque dossier
-        for folder, files in files_by_folder.items():
-            print(f"Traitement des fichiers dans le dossier : {folder}")
+    # Format des CSV produits (OUTPUT_FORMAT=parquet les convertit en Parquet typé et compressé)
+    output_format = get_output_format()
+    # Moteur de réécriture des CSV (TRANSFORM_ENGINE=pandas ou polars), validé avant tout téléchargement
+    logging.info(f"Moteur de transformation des CSV : {get_engine()}")
 
-            # Répertoire de destination pour le téléchargement
-            download_dir = os.path.join("data", folder)
-            
-            for file in tqdm(files, desc=f"Téléchargement des fichiers {folder}"):
-                downloaded_file_path = download_file(container_url, file, download_dir)
+    # Téléchargement des fichiers pour chaque dossier
+    for folder, files in files_by_folder.items():
+        print(f"Traitement des fichiers dans le dossier : {folder}")
 
-                # Si le fichier téléchargé est un .zip, le décompresser et traiter les fichiers CSV à l'intérieur
-                if downloaded_file_path.endswith(".zip"):
-                    unzip_and_process_zip(downloaded_file_path, download_dir)
+        # Répertoire de destination pour le téléchargement
+        download_dir = os.path.join("data", folder)
 
+        # Ignore les blobs inchangés depuis la dernière exécution
+        blobs = {blob.name: blob for blob in files if full_sync or not manifest.is_unchanged(blob)}
+        if len(blobs) < len(files):
+            logging.info(f"{len(files) - len(blobs)} fichier(s) inchangé(s) ignoré(s) dans {folder}.")
+
+        def process_blob(blob_name, download_dir=download_dir, blobs=blobs):
+            # Archive lue directement dans le conteneur, membre par membre, sans copie locale
+            if zip_remote_read and blob_name.endswith(".zip"):
+                blob_client = container_client.get_blob_client(blob_name)
+                size, etag = blobs[blob_name].size, blobs[blob_name].etag
+                outputs = unzip_and_process_zip(
+                    lambda: BlobRangeFile(blob_client, size=size, stage="csv", etag=etag), download_dir,
+                    zip_normalize, zip_chunksize, zip_workers, output_format,
+                )
+                manifest.record(blobs[blob_name], outputs)
+                return None
+
+            blob = blobs[blob_name]
+            downloaded_file_path = download_file(
+                container_client, blob_name, download_dir, max_concurrency, blob.etag, blob.size,
+                blob.content_settings.content_md5,
+            )
+            if downloaded_file_path.endswith(".csv"):
+                downloaded_file_path = convert_csv_file(downloaded_file_path, output_format)
+            outputs = [downloaded_file_path]
+
+            # Si le fichier téléchargé est un .zip, le décompresser et traiter les fichiers CSV à l'intérieur
+            if downloaded_file_path.endswith(".zip"):
+                outputs.extend(unzip_and_process_zip(
+                    downloaded_file_path, download_dir, zip_normalize, zip_chunksize, zip_workers, output_format
+                ))
+
+            manifest.record(blobs[blob_name], outputs)
+            return downloaded_file_path
+
+        _, errors = download_blobs(
+            list(blobs), process_blob, max_workers=max_workers, max_retries=max_retries,
+            desc=f"Téléchargement des fichiers {folder}"
+        )
+        failed_files.update(errors)
+
+    manifest.save()
+    if own_session:
+        session.close()
+    log_setup.flush_items()
+
+    if failed_files:
+        print(f"{len(failed_files)} fichier(s) en échec : {', '.join(failed_files)}")
+    else:
         print("Tous les fichiers ont été téléchargés et traités.")
-    except Exception as e:
-        print(f"Erreur : {e}")
+    return failed_files
+
+if __name__ == "__main__":
+    try:
+        failed_files = main()
+    finally:
+        metrics.write_report("csv")
+    # Code de sortie non nul si des fichiers sont en échec (main.sh, benchmarks)
+    if failed_files:
+        sys.exit(1)
@@ -1,162 +1,276 @@
 import os
+import sys
 import logging
 from dotenv import load_dotenv
-from azure.storage.blob import ContainerClient, generate_container_sas, ContainerSasPermissions
-from datetime import datetime, timedelta, timezone
-import io
 from tqdm import tqdm
-import pandas as pd
-from PIL import Image
+import pyarrow as pa
+import pyarrow.parquet as pq
+from blob_download import create_container_client, download_blobs
+from blob_cache import fetch_blob
+from blob_manifest import BlobManifest
+from blob_listing import BlobListing
+from image_export import create_pool, export_images
+from image_shards import ShardWriter
+from blob_file import BlobRangeFile
+from blob_session import BlobSession
+from output_sink import open_sink, get_output_format
+import metrics
+import log_setup
 
 # Chargement des variables d'environnement depuis un fichier .env
 load_dotenv()
 
-# Configuration du répertoire de logs
-log_dir = './logs'
-os.makedirs(log_dir, exist_ok=True)
+# Configuration de la journalisation (écriture asynchrone ; sans effet si le pipeline l'a déjà configurée)
+log_setup.configure("./logs/parquet_extraction.log")
 
-# Configuration de la journalisation
-logging.basicConfig(
-    filename="./logs/parquet_extraction.log",  # Fichier où les logs seront enregistrés
-    level=logging.INFO,  # Niveau minimal pour journaliser (INFO et supérieur)
-    format='%(asctime)s - %(levelname)s - %(message)s'  # Format des messages de log
-)
+# Dossiers où rechercher les fichiers Parquet (PARQUET_FOLDERS, séparés par des virgules ; tout le conteneur par défaut)
+PARQUET_FOLDERS = [folder for folder in os.getenv("PARQUET_FOLDERS", "").split(",") if folder] or None
 
-def generate_sas_token(account_name, account_key, container_name):
-    """
-    Génère un SAS (Shared Access Signature) pour accéder à un conteneur Azure Blob Storage.
-
-    Arguments:
-        account_name (str): Nom du compte de stockage Azure.
-        account_key (str): Clé d'accès au compte.
-        container_name (str): Nom du conteneur cible.
-
-    Retourne:
-        str: Un SAS token permettant l'accès au conteneur.
-
-    Lève:
-        Exception: En cas d'erreur lors de la génération du SAS token.
-    """
-    try:
-        # Génère un SAS avec permissions de lecture et de liste, valable 1 heure
-        sas_token = generate_container_sas(
-            account_name=account_name,
-            account_key=account_key,
-            container_name=container_name,
-            permission=ContainerSasPermissions(read=True, list=True),
-            expiry=datetime.now(timezone.utc) + timedelta(hours=1)
-        )
-        return sas_token
-    except Exception as e:
-        logging.error(f"Erreur lors de la génération du SAS : {e}")
-        raise
-
-def generate_sas_url():
-    """
-    Génère une URL complète pour accéder à un conteneur Azure avec un SAS.
-
-    Retourne:
-        str: URL complète du conteneur avec le SAS token.
-    """
-    account_name = os.getenv("ACCOUNT_NAME")
-    account_key = os.getenv("ACCOUNT_KEY")
-    container_name = os.getenv("CONTAINER_NAME")
-    sas_token = generate_sas_token(account_name, account_key, container_name)
-    return f"https://{account_name}.blob.core.windows.net/{container_name}?{sas_token}"
-
-def list_blobs_with_extension(container_url, file_extension="parquet"):
+def list_blobs_with_extension(container_client, file_extension="parquet", folders=None):
     """
     Liste tous les blobs (fichiers) ayant une extension donnée dans un conteneur Azure.
 
     Arguments:
-        container_url (str): URL du conteneur avec SAS.
+        container_client (ContainerClient): Client du conteneur.
         file_extension (str): Extension des fichiers à rechercher (par défaut : "parquet").
+        folders (list): Dossiers à lister côté serveur ; None pour tout le conteneur.
 
     Retourne:
-        list: Liste des noms de blobs correspondant à l'extension.
+        list: Liste des propriétés (nom, ETag, taille, date de modification) des blobs correspondant à l'extension.
 
     Lève:
         Exception: Si une erreur survient lors de la récupération des blobs.
     """
     try:
-        container_client = ContainerClient.from_container_url(container_url)
-        blobs = container_client.list_blobs()
-        # Filtre les blobs pour ne garder que ceux qui terminent par l'extension donnée
-        blob_names = [blob.name for blob in blobs if blob.name.endswith(f".{file_extension}")]
-        return blob_names
+        listing = BlobListing()
+        listing.add_consumer("parquet", [f".{file_extension}"], folders)
+        return [blob for blobs in listing.run(container_client)["parquet"].values() for blob in blobs]
     except Exception as e:
         logging.error(f"Erreur lors de la liste des blobs : {e}")
         raise
 
-def download_parquet_with_sas(container_url, blob_name, download_path):
+def download_parquet_with_sas(container_client, blob_name, download_path, max_concurrency=4, etag=None, size=None,
+                              content_md5=None):
     """
     Télécharge un fichier .parquet depuis Azure Blob Storage vers un répertoire local.
+    Le contenu est écrit segment par segment dans un fichier temporaire renommé une fois complet ;
+    un téléchargement interrompu reprend au dernier octet validé. Un contenu déjà présent
+    dans le cache local des blobs n'est pas retéléchargé.
 
     Arguments:
-        container_url (str): URL du conteneur avec SAS.
+        container_client (ContainerClient): Client du conteneur, partagé entre les téléchargements.
         blob_name (str): Nom du blob à télécharger.
         download_path (str): Chemin local pour enregistrer le fichier.
+        max_concurrency (int): Nombre de plages téléchargées en parallèle pour un grand blob.
+        etag (str): ETag du blob issu du listing, pour conditionner la reprise.
+        size (int): Taille du blob issue du listing.
+        content_md5 (bytes): Content-MD5 du blob issu du listing, pour le retrouver dans le cache sous un autre nom.
 
     Lève:
         Exception: En cas d'erreur durant le téléchargement.
     """
     try:
-        container_client = ContainerClient.from_container_url(container_url)
         blob_client = container_client.get_blob_client(blob_name)
-        
-        # Crée les répertoires nécessaires avant le téléchargement
-        os.makedirs(os.path.dirname(download_path), exist_ok=True)
-        with open(download_path, "wb") as file:
-            # Télécharge le contenu du blob
-            file.write(blob_client.download_blob().readall())
-        
-        logging.info(f"Blob téléchargé : {blob_name} -> {download_path}")
+
+        # Télécharge le contenu du blob par segments, sans le charger entièrement en mémoire
+        downloaded = fetch_blob(
+            blob_client, download_path, max_concurrency=max_concurrency, stage="parquet", etag=etag, size=size,
+            content_md5=content_md5,
+        )
+
+        log_setup.item_log("Blobs Parquet téléchargés").record(blob_name, bytes=downloaded)
     except Exception as e:
         logging.error(f"Erreur lors du téléchargement de {blob_name} : {e}")
         raise
 
-if __name__ == "__main__":
-    # Génère l'URL complète pour accéder au conteneur
-    full_url = generate_sas_url()
+def export_parquet_data(parquet_source, base_path, output_format=None, exclude_columns=("image",), batch_size=65536):
+    """
+    Exporte les données textuelles d'un fichier Parquet en flux, lot par lot, sans lire les colonnes exclues.
+
+    Seules les colonnes conservées sont lues depuis le fichier (projection), puis
+    chaque lot est écrit immédiatement dans la sortie : la mémoire reste bornée par
+    un lot et les octets des images ne sont jamais lus. En Parquet, les types du
+    fichier source sont conservés.
+
+    Arguments:
+        parquet_source (str | file): Chemin ou fichier Parquet lisible par pyarrow.
+        base_path (str): Chemin de sortie (l'extension du format est ajoutée si absente).
+        output_format (str): "csv" ou "parquet" ; OUTPUT_FORMAT par défaut.
+        exclude_columns (tuple): Colonnes à ne pas lire ni exporter (par défaut : "image").
+        batch_size (int): Nombre maximal de lignes lues par lot.
+
+    Retourne:
+        tuple: (chemin écrit, nombre de lignes).
+
+    Lève:
+        Exception: En cas d'erreur de lecture ou d'écriture.
+    """
+    parquet_file = pq.ParquetFile(parquet_source)
+    columns = [name for name in parquet_file.schema_arrow.names if name not in exclude_columns]
+    schema = pa.schema([parquet_file.schema_arrow.field(name) for name in columns])
+
+    with open_sink(base_path, output_format, schema=schema) as sink:
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            sink.write_batch(batch)
+    return sink.path, sink.rows
+
+def main(list_blobs=None, container_url=None, session=None):
+    """
+    Télécharge les fichiers Parquet du conteneur et en extrait les images et les données textuelles.
+
+    Arguments:
+        list_blobs (list): BlobProperties issues d'un listing déjà effectué, par exemple par
+                           une passe de listing partagée ; listées ici si absentes.
+        container_url (str): URL du conteneur avec un SAS fixe ; prioritaire sur `session`.
+        session (BlobSession): Session à SAS renouvelé ; créée depuis l'environnement si
+                               ni `container_url` ni `session` ne sont fournis.
+
+    Retourne:
+        dict: Erreurs de téléchargement par blob.
+    """
+
+    # Nombre de téléchargements simultanés et de tentatives par blob
+    max_workers = int(os.getenv("BLOB_MAX_WORKERS", "8"))
+    max_retries = int(os.getenv("BLOB_MAX_RETRIES", "3"))
+
+    # Taille des segments téléchargés et nombre de plages parallèles par blob
+    chunk_size = int(os.getenv("BLOB_CHUNK_SIZE", str(4 * 1024 * 1024)))
+    max_concurrency = int(os.getenv("BLOB_MAX_CONCURRENCY", "4"))
+
+    # Client unique partagé par tous les téléchargements ; sans URL fournie, le SAS est
+    # renouvelé automatiquement avant son expiration pendant toute la durée de l'exécution
+    own_session = container_url is None and session is None
+    if own_session:
+        session = BlobSession.from_env()
+    if container_url:
+        container_client = create_container_client(container_url, max_workers, chunk_size, max_concurrency)
+    else:
+        container_client = session.container_client(max_workers, chunk_size, max_concurrency)
 
     # Liste tous les blobs .parquet dans le conteneur
-    list_blobs = list_blobs_with_extension(full_url)
-    logging.info(f"Liste des fichiers Parquet : {list_blobs}")
+    if list_blobs is None:
+        list_blobs = list_blobs_with_extension(container_client, folders=PARQUET_FOLDERS)
+    logging.info(f"{len(list_blobs)} fichier(s) Parquet listé(s).")
+
+    # Manifeste des blobs déjà synchronisés (BLOB_FULL_SYNC=1 force un retraitement complet)
+    manifest = BlobManifest("./data/.manifests/parquet.json")
+    full_sync = os.getenv("BLOB_FULL_SYNC", "0") == "1"
+    changed_blobs = [blob for blob in list_blobs if full_sync or not manifest.is_unchanged(blob)]
+    if len(changed_blobs) < len(list_blobs):
+        logging.info(f"{len(list_blobs) - len(changed_blobs)} fichier(s) Parquet inchangé(s) ignoré(s).")
 
-    # Parcourt chaque blob et télécharge son contenu
-    for blob in tqdm(list_blobs, desc="Téléchargement des fichiers", unit="fichier"):
+    blobs_by_name = {blob.name: blob for blob in changed_blobs}
+
+    def download_blob(blob):
         # Chemin local pour enregistrer le fichier téléchargé
         download_path = f"./data/parquet/downloads/{os.path.basename(blob)}"
-        
-        # Télécharge le fichier
-        download_parquet_with_sas(full_url, blob, download_path)
-        
-        # Lecture du fichier .parquet téléchargé
-        df = pd.read_parquet(download_path, engine="pyarrow")
-        
-        # Sauvegarde des images contenues dans le DataFrame, si présentes
-        try:
-            if "image" in df.columns:
-                image_dir = './data/parquet/images'
-                os.makedirs(image_dir, exist_ok=True)
-                for index, row in df.iterrows():
-                    # Extraction et sauvegarde des images
-                    image_data = row['image']['bytes']
-                    image = Image.open(io.BytesIO(image_data))
-                    image_name = f"{image_dir}/{row['item_ID']}.png"
-                    image.save(image_name, format="PNG")
-                    logging.info(f"Image sauvegardée : {image_name}")
-        except Exception as e:
-            logging.error(f"Erreur lors du traitement des images : {e}")
-            raise
-        
-        # Sauvegarde des données textuelles dans un fichier CSV
-        try:
-            data_dir = './data/parquet/data'
-            os.makedirs(data_dir, exist_ok=True)
-            csv_path = f"{data_dir}/{os.path.basename(blob)}.csv"
-            df.drop(columns=['image'], errors='ignore').to_csv(csv_path, index=False)
-            logging.info(f"Données textuelles sauvegardées : {csv_path}")
-        except Exception as e:
-            logging.error(f"Erreur lors de la sauvegarde des données textuelles : {e}")
-            raise
\ No newline at end of file
+        properties = blobs_by_name[blob]
+        download_parquet_with_sas(
+            container_client, blob, download_path, max_concurrency, properties.etag, properties.size,
+            properties.content_settings.content_md5,
+        )
+        return download_path
+
+    # PARQUET_REMOTE_READ=1 lit les fichiers directement dans le conteneur par plages, sans les télécharger
+    remote_read = os.getenv("PARQUET_REMOTE_READ", "0") == "1"
+    if remote_read:
+        # Fichiers ouverts un par un au moment de leur traitement (lecture du pied de page comprise)
+        downloaded = blobs_by_name
+        errors = {}
+    else:
+        # Télécharge les blobs en parallèle ; un blob en échec n'interrompt pas les autres
+        downloaded, errors = download_blobs([blob.name for blob in changed_blobs], download_blob, max_workers=max_workers, max_retries=max_retries)
+        if errors:
+            logging.error(f"{len(errors)} fichier(s) Parquet non téléchargé(s) : {list(errors)}")
+
+    # Nombre de processus pour l'export des images et copie directe des PNG (IMAGE_PASSTHROUGH=0 force le réencodage)
+    export_images_enabled = os.getenv("PARQUET_EXPORT_IMAGES", "1") == "1"
+    image_workers = int(os.getenv("IMAGE_MAX_WORKERS", "0")) or None
+    image_passthrough = os.getenv("IMAGE_PASSTHROUGH", "1") == "1"
+
+    # IMAGE_OUTPUT=shards regroupe les images dans de gros fichiers tar indexés par item_ID
+    image_output = os.getenv("IMAGE_OUTPUT", "files")
+    if image_output not in ("files", "shards"):
+        raise ValueError(f"Mode de sortie des images non pris en charge : {image_output} (attendu : files, shards)")
+    shard_writer = None
+    if export_images_enabled and image_output == "shards":
+        shard_writer = ShardWriter(
+            os.getenv("IMAGE_SHARD_DIR", "./data/parquet/shards"),
+            shard_size=int(float(os.getenv("IMAGE_SHARD_SIZE_MB", "1024")) * 1024 * 1024),
+        )
+
+    # Format des données textuelles exportées (OUTPUT_FORMAT : csv ou parquet)
+    output_format = get_output_format()
+
+    # Pool de processus des images, démarré une seule fois pour tous les fichiers de l'exécution
+    image_pool = create_pool(image_workers) if export_images_enabled and downloaded else None
+    try:
+        # Parcourt chaque fichier téléchargé
+        for blob_properties in tqdm([b for b in changed_blobs if b.name in downloaded], desc="Traitement des fichiers", unit="fichier"):
+            blob = blob_properties.name
+            if remote_read:
+                source = BlobRangeFile(container_client.get_blob_client(blob), size=blob_properties.size,
+                                       stage="parquet", etag=blob_properties.etag)
+            else:
+                source = downloaded[blob]
+            outputs = [] if remote_read else [source]
+
+            # Sauvegarde des images contenues dans le fichier, si présentes, sur plusieurs cœurs
+            if export_images_enabled:
+                try:
+                    image_dir = './data/parquet/images'
+                    with metrics.timer("parquet", "images", blob) as timer:
+                        images, image_outputs = export_images(source, image_dir, max_workers=image_workers,
+                                                              passthrough=image_passthrough, shard_writer=shard_writer,
+                                                              executor=image_pool)
+                        timer.add(items=images)
+                    # Répertoire des images (ou shards et index) : quelques sorties par blob, et non une par image
+                    outputs.extend(image_outputs)
+                except Exception as e:
+                    logging.error(f"Erreur lors du traitement des images : {e}")
+                    raise
+
+            # Sauvegarde des données textuelles dans un fichier CSV ou Parquet
+            try:
+                data_dir = './data/parquet/data'
+                with metrics.timer("parquet", "write", blob) as timer:
+                    data_path, rows = export_parquet_data(source, f"{data_dir}/{os.path.basename(blob)}", output_format)
+                    timer.add(bytes=os.path.getsize(data_path), rows=rows)
+                log_setup.item_log("Données textuelles sauvegardées").record(data_path, rows=rows)
+                outputs.append(data_path)
+            except Exception as e:
+                logging.error(f"Erreur lors de la sauvegarde des données textuelles : {e}")
+                raise
+
+            if remote_read:
+                log_setup.item_log("Fichiers Parquet lus à distance").record(
+                    f"{blob} ({source.bytes_fetched}/{source.size} octets, {source.requests} requêtes)",
+                    bytes=source.bytes_fetched,
+                )
+
+            # Enregistre le blob et ses sorties pour les exécutions suivantes (journalisé immédiatement)
+            manifest.record(blob_properties, outputs, images=images if export_images_enabled else None)
+    finally:
+        if image_pool is not None:
+            image_pool.shutdown()
+
+    if shard_writer is not None:
+        logging.info(
+            f"Shards d'images : {shard_writer.written} image(s) écrite(s), "
+            f"{shard_writer.deduplicated} doublon(s) non réécrit(s)."
+        )
+        shard_writer.close()
+    manifest.save()
+    if own_session:
+        session.close()
+    log_setup.flush_items()
+    return errors
+
+if __name__ == "__main__":
+    try:
+        errors = main()
+    finally:
+        metrics.write_report("parquet")
+    # Code de sortie non nul si des blobs n'ont pas pu être téléchargés
+    if errors:
+        sys.exit(1)
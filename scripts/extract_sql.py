@@ -1,25 +1,29 @@
 import pyodbc
 import pandas as pd
-from loguru import logger
+import logging
 import os
+import sys
+import csv
+import time
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from sql_pool import ConnectionPool
+from sql_watermark import WatermarkStore
+from sql_catalog import load_catalog
+from output_sink import open_sink, output_path, get_output_format, sql_schema
+import pyarrow as pa
+import pyarrow.parquet as pq
+import metrics
+import log_setup
 
 # Charger les variables d'environnement depuis un fichier `.env`
 load_dotenv()
 
-# Configuration du répertoire des logs
-log_directory = './logs'
-# Crée le répertoire pour les fichiers de logs si nécessaire
-os.makedirs(log_directory, exist_ok=True)
-
-# Configuration du logger avec loguru
-logger.add(
-    os.path.join(log_directory, 'sql_extraction.log'),  # Fichier log
-    rotation="1 MB",  # Taille maximale d'un fichier log avant rotation
-    retention="10 days",  # Durée de rétention des fichiers logs
-    level="INFO",  # Niveau minimal pour journaliser
-    format="{time} - {level} - {message}",  # Format des messages log
-)
+# Journalisation asynchrone (file d'attente et thread d'écriture) dans ./logs/sql_extraction.log,
+# avec rotation par taille ; sans effet si le pipeline l'a déjà configurée
+log_setup.configure(os.path.join('./logs', 'sql_extraction.log'))
+logger = logging.getLogger("extract_sql")
 
 def connect_to_sql_server(server, database, username, password):
     """
@@ -53,37 +57,41 @@ def connect_to_sql_server(server, database, username, password):
         logger.error(f"Erreur de connexion au serveur SQL : {e}")
         raise
 
-def get_tables_in_schema(connection, schema_name):
+def get_compatible_columns(connection, schema_name, table_name):
     """
-    Récupère les noms des tables dans un schéma donné.
+    Identifie les colonnes compatibles pour une extraction depuis une table donnée.
 
     Arguments:
         connection (pyodbc.Connection): Connexion active à la base de données.
-        schema_name (str): Nom du schéma dont on veut lister les tables.
+        schema_name (str): Nom du schéma contenant la table.
+        table_name (str): Nom de la table cible.
 
     Retourne:
-        list: Une liste des noms des tables dans le schéma spécifié.
+        list: Une liste des noms des colonnes compatibles.
 
     Lève:
-        Exception: Si la récupération échoue, une exception est levée et journalisée.
+        Exception: Si une erreur survient lors de la récupération, elle est journalisée et levée.
     """
     query = f"""
-    SELECT TABLE_NAME
-    FROM INFORMATION_SCHEMA.TABLES
-    WHERE TABLE_SCHEMA = '{schema_name}' AND TABLE_TYPE = 'BASE TABLE';
+    SELECT COLUMN_NAME
+    FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_SCHEMA = '{schema_name}' AND TABLE_NAME = '{table_name}'
+    AND DATA_TYPE NOT IN ('geometry', 'geography', 'xml', 'hierarchyid', 'sql_variant');
     """
     try:
-        # Exécute la requête SQL et retourne les résultats sous forme de DataFrame pandas
-        tables = pd.read_sql_query(query, connection)
-        logger.info(f"{len(tables)} tables trouvées dans le schéma '{schema_name}': {tables['TABLE_NAME'].tolist()}")
-        return tables['TABLE_NAME'].tolist()
+        # Exécute la requête pour récupérer les colonnes compatibles
+        columns = pd.read_sql_query(query, connection)
+        if columns.empty:
+            logger.warning(f"Aucune colonne compatible trouvée dans {schema_name}.{table_name}.")
+            return []
+        return columns['COLUMN_NAME'].tolist()
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération des tables pour le schéma '{schema_name}' : {e}")
+        logger.error(f"Erreur lors de la récupération des colonnes compatibles pour {schema_name}.{table_name} : {e}")
         raise
 
-def get_compatible_columns(connection, schema_name, table_name):
+def get_primary_key_columns(connection, schema_name, table_name):
     """
-    Identifie les colonnes compatibles pour une extraction depuis une table donnée.
+    Récupère les colonnes de la clé primaire d'une table, dans l'ordre de la clé.
 
     Arguments:
         connection (pyodbc.Connection): Connexion active à la base de données.
@@ -91,46 +99,184 @@ def get_compatible_columns(connection, schema_name, table_name):
         table_name (str): Nom de la table cible.
 
     Retourne:
-        list: Une liste des noms des colonnes compatibles.
+        list: Noms des colonnes de la clé primaire (liste vide si la table n'en a pas).
 
     Lève:
         Exception: Si une erreur survient lors de la récupération, elle est journalisée et levée.
     """
     query = f"""
-    SELECT COLUMN_NAME
-    FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE TABLE_SCHEMA = '{schema_name}' AND TABLE_NAME = '{table_name}'
-    AND DATA_TYPE NOT IN ('geometry', 'geography', 'xml', 'hierarchyid', 'sql_variant');
+    SELECT kcu.COLUMN_NAME
+    FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc
+    JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE kcu
+        ON kcu.CONSTRAINT_SCHEMA = tc.CONSTRAINT_SCHEMA AND kcu.CONSTRAINT_NAME = tc.CONSTRAINT_NAME
+    WHERE tc.TABLE_SCHEMA = '{schema_name}' AND tc.TABLE_NAME = '{table_name}'
+    AND tc.CONSTRAINT_TYPE = 'PRIMARY KEY'
+    ORDER BY kcu.ORDINAL_POSITION;
     """
     try:
-        # Exécute la requête pour récupérer les colonnes compatibles
         columns = pd.read_sql_query(query, connection)
-        if columns.empty:
-            logger.warning(f"Aucune colonne compatible trouvée dans {schema_name}.{table_name}.")
-            return []
         return columns['COLUMN_NAME'].tolist()
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération des colonnes compatibles pour {schema_name}.{table_name} : {e}")
+        logger.error(f"Erreur lors de la récupération de la clé primaire de {schema_name}.{table_name} : {e}")
         raise
 
-def extract_table_to_csv(connection, table_name, schema_name, output_dir):
+def write_query_to_sink(connection, query, sink, batch_size=10000, params=(), watermark_column=None, since=None):
     """
-    Extrait les données d'une table et les sauvegarde dans un fichier CSV.
+    Exécute une requête et écrit son résultat dans une sortie (CSV ou Parquet), lot par lot.
+
+    Arguments:
+        connection (pyodbc.Connection): Connexion active à la base de données.
+        query (str): Requête SELECT à exécuter.
+        sink (CsvSink | ParquetSink): Sortie ouverte ; elle n'est pas fermée par cette fonction.
+        batch_size (int): Nombre de lignes lues par lot (`cursor.fetchmany`).
+        params (tuple): Paramètres de la requête.
+        watermark_column (str): Colonne dont on calcule la valeur maximale au fil de l'écriture.
+        since (datetime): Marque précédente ; les lignes dont `watermark_column` la dépasse strictement sont comptées.
+
+    Retourne:
+        tuple: (nombre de lignes écrites, valeur maximale de `watermark_column` ou None,
+                nombre de lignes postérieures à `since`, ou de lignes écrites si `since` est None).
+    """
+    rows = 0
+    newer = 0
+    max_value = None
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, *params)
+        header = [column[0] for column in cursor.description]
+        watermark_index = header.index(watermark_column) if watermark_column in header else None
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            sink.write_rows(batch)
+            rows += len(batch)
+            if watermark_index is not None:
+                values = [row[watermark_index] for row in batch if row[watermark_index] is not None]
+                if values:
+                    batch_max = max(values)
+                    max_value = batch_max if max_value is None else max(max_value, batch_max)
+                if since is not None:
+                    newer += sum(1 for value in values if value > since)
+    finally:
+        cursor.close()
+    return rows, max_value, rows if since is None else newer
+
+def merge_delta_into_csv(output_file, delta_file, key_columns):
+    """
+    Fusionne un CSV de lignes modifiées dans le CSV existant d'une table, par clé primaire.
+
+    Les lignes existantes dont la clé figure dans le delta sont remplacées par leur
+    nouvelle version ; seules les clés du delta sont gardées en mémoire. Les lignes
+    supprimées à la source ne sont pas détectées.
+
+    Arguments:
+        output_file (str): CSV complet de la table, mis à jour en place (renommage atomique).
+        delta_file (str): CSV des lignes modifiées depuis la dernière marque.
+        key_columns (list): Colonnes de la clé primaire.
+
+    Lève:
+        ValueError: Si les en-têtes des deux fichiers diffèrent.
+    """
+    with open(delta_file, "r", newline="", encoding="utf-8") as delta:
+        reader = csv.reader(delta)
+        header = next(reader)
+        key_indexes = [header.index(column) for column in key_columns]
+        delta_keys = {tuple(row[i] for i in key_indexes) for row in reader}
+
+    temp_file = f"{output_file}.tmp"
+    try:
+        with open(output_file, "r", newline="", encoding="utf-8") as source, \
+                open(temp_file, "w", newline="", encoding="utf-8") as target:
+            reader = csv.reader(source)
+            if next(reader) != header:
+                raise ValueError(f"Les colonnes de {output_file} ne correspondent plus à celles de la table.")
+            writer = csv.writer(target)
+            writer.writerow(header)
+            for row in reader:
+                if tuple(row[i] for i in key_indexes) not in delta_keys:
+                    writer.writerow(row)
+            with open(delta_file, "r", newline="", encoding="utf-8") as delta:
+                reader = csv.reader(delta)
+                next(reader)
+                writer.writerows(reader)
+        os.replace(temp_file, output_file)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+def merge_delta_into_parquet(output_file, delta_file, key_columns):
+    """
+    Fusionne un fichier Parquet de lignes modifiées dans le Parquet existant d'une table, par clé primaire.
+
+    Le fichier existant est relu groupe par groupe ; seules les clés du delta sont gardées en mémoire.
+
+    Arguments:
+        output_file (str): Parquet complet de la table, réécrit via un fichier temporaire.
+        delta_file (str): Parquet des lignes modifiées depuis la dernière marque.
+        key_columns (list): Colonnes de la clé primaire.
+
+    Lève:
+        ValueError: Si les colonnes des deux fichiers diffèrent.
+    """
+    delta = pq.ParquetFile(delta_file)
+    existing = pq.ParquetFile(output_file)
+    if existing.schema_arrow.names != delta.schema_arrow.names:
+        raise ValueError(f"Les colonnes de {output_file} ne correspondent plus à celles de la table.")
+    delta_key_table = delta.read(columns=key_columns)
+    delta_keys = set(zip(*[delta_key_table.column(column).to_pylist() for column in key_columns]))
+
+    with open_sink(output_file, "parquet", schema=existing.schema_arrow) as sink:
+        for batch in existing.iter_batches():
+            keys = zip(*[batch.column(column).to_pylist() for column in key_columns])
+            sink.write_batch(batch.filter(pa.array([key not in delta_keys for key in keys])))
+        for batch in delta.iter_batches():
+            sink.write_batch(batch)
+
+def extract_table_to_csv(connection, table_name, schema_name, output_dir, batch_size=10000,
+                         watermarks=None, watermark_column="ModifiedDate", catalog=None, output_format=None):
+    """
+    Extrait les données d'une table et les sauvegarde dans un fichier CSV (ou Parquet).
+
+    Les lignes sont lues par lots de `batch_size` (`cursor.fetchmany`) et écrites
+    dans la sortie au fur et à mesure : la mémoire reste constante quelle que soit la
+    taille de la table et les premiers octets sont écrits dès le premier lot. En
+    Parquet, les types sont ceux des colonnes SQL Server décrites par le catalogue.
+
+    En mode incrémental (`watermarks` fourni), seules les lignes dont la colonne
+    `watermark_column` atteint la marque enregistrée sont lues, puis fusionnées dans
+    la sortie existante par clé primaire. Si aucune ne la dépasse strictement (lignes
+    déjà exportées), la sortie et la marque sont laissées intactes : une table
+    inchangée n'est pas réécrite. Les tables sans colonne de suivi, sans clé primaire
+    ou sans export précédent sont extraites entièrement.
 
     Arguments:
         connection (pyodbc.Connection): Connexion active à la base de données.
         table_name (str): Nom de la table à extraire.
         schema_name (str): Nom du schéma contenant la table.
-        output_dir (str): Répertoire où enregistrer le fichier CSV.
+        output_dir (str): Répertoire où enregistrer le fichier.
+        batch_size (int): Nombre de lignes lues par lot.
+        watermarks (WatermarkStore): Marques des extractions précédentes (mode incrémental).
+        watermark_column (str): Colonne de suivi des modifications.
+        catalog (Catalog): Instantané du catalogue ; évite les requêtes de métadonnées par table.
+        output_format (str): "csv" ou "parquet" ; OUTPUT_FORMAT par défaut.
 
     Actions:
         - Crée des sous-répertoires pour chaque schéma si nécessaire.
-        - Sauvegarde les données sous forme de fichier CSV dans le répertoire spécifié.
+        - Sauvegarde les données dans le répertoire spécifié (via un fichier
+          temporaire renommé une fois l'export terminé).
+
+    Retourne:
+        int: Nombre de lignes exportées.
 
     Lève:
         Exception: Si une erreur survient lors de l'extraction, elle est journalisée et levée.
     """
-    compatible_columns = get_compatible_columns(connection, schema_name, table_name)
+    if catalog is not None:
+        compatible_columns = catalog.compatible_columns(schema_name, table_name)
+    else:
+        compatible_columns = get_compatible_columns(connection, schema_name, table_name)
     if not compatible_columns:
         logger.warning(f"Extraction ignorée pour {schema_name}.{table_name} (aucune colonne compatible).")
         return
@@ -138,33 +284,289 @@ def extract_table_to_csv(connection, table_name, schema_name, output_dir):
     # Prépare la liste des colonnes pour la requête SELECT
     column_list = ', '.join([f"[{col}]" for col in compatible_columns])
     query = f"SELECT {column_list} FROM {schema_name}.{table_name}"
-    output_file = os.path.join(output_dir, schema_name, f"{table_name}.csv")
+    output_format = output_format or get_output_format()
+    base_path = os.path.join(output_dir, schema_name, table_name)
+    output_file = output_path(base_path, output_format)
+    schema = sql_schema(catalog.columns(schema_name, table_name)) if catalog is not None else None
 
     # Crée le répertoire du schéma si nécessaire
     schema_dir = os.path.join(output_dir, schema_name)
     os.makedirs(schema_dir, exist_ok=True)
 
+    # Colonne de suivi utilisable pour une extraction incrémentale
+    tracked_column = watermark_column if watermarks is not None and watermark_column in compatible_columns else None
+
+    sink = None
     try:
-        # Exécute la requête et récupère les données dans un DataFrame pandas
-        df = pd.read_sql_query(query, connection)
-        if df.empty:
+        if tracked_column:
+            watermark = watermarks.get(schema_name, table_name, tracked_column)
+            if catalog is not None:
+                key_columns = catalog.primary_key(schema_name, table_name)
+            else:
+                key_columns = get_primary_key_columns(connection, schema_name, table_name)
+            if watermark is not None and key_columns and os.path.exists(output_file) \
+                    and all(column in compatible_columns for column in key_columns):
+                # Ne lit que les lignes modifiées depuis la dernière marque, puis les fusionne par clé
+                sink = open_sink(f"{base_path}.delta", output_format, compatible_columns, schema)
+                with metrics.timer("sql", "query", f"{schema_name}.{table_name}") as timer:
+                    # `>=` : les lignes de même horodatage que la marque, validées après l'extraction
+                    # précédente, ne sont pas perdues
+                    rows, max_value, changed = write_query_to_sink(
+                        connection, f"{query} WHERE [{tracked_column}] >= ?", sink,
+                        batch_size, (watermark,), tracked_column, since=watermark,
+                    )
+                    sink.close()
+                    timer.add(bytes=os.path.getsize(sink.path), rows=rows)
+                # Sans ligne strictement postérieure à la marque, le delta ne contient que des lignes
+                # déjà exportées : la marque n'avance pas, et d'éventuelles lignes de même horodatage
+                # seront fusionnées avec les prochaines modifications
+                if changed:
+                    with metrics.timer("sql", "merge", f"{schema_name}.{table_name}") as timer:
+                        if output_format == "parquet":
+                            merge_delta_into_parquet(output_file, sink.path, key_columns)
+                        else:
+                            merge_delta_into_csv(output_file, sink.path, key_columns)
+                        timer.add(bytes=os.path.getsize(output_file), rows=rows)
+                    watermarks.set(schema_name, table_name, tracked_column, max(watermark, max_value))
+                os.remove(sink.path)
+                logger.info(f"{schema_name}.{table_name} : {changed} ligne(s) modifiée(s) depuis {watermark.isoformat()} fusionnée(s).")
+                return changed
+
+        # Exécute la requête et écrit les lignes dans la sortie lot par lot
+        sink = open_sink(base_path, output_format, compatible_columns, schema)
+        with metrics.timer("sql", "query", f"{schema_name}.{table_name}") as timer:
+            rows, max_value, _ = write_query_to_sink(connection, query, sink, batch_size, watermark_column=tracked_column)
+            if rows:
+                sink.close()
+                timer.add(bytes=os.path.getsize(output_file), rows=rows)
+
+        if rows == 0:
+            sink.abort()
             logger.warning(f"La table {schema_name}.{table_name} est vide. Aucune donnée à sauvegarder.")
         else:
-            # Sauvegarde les données dans un fichier CSV
-            df.to_csv(output_file, index=False)
-            logger.info(f"Données de {schema_name}.{table_name} sauvegardées dans {output_file}.")
+            if tracked_column and max_value is not None:
+                watermarks.set(schema_name, table_name, tracked_column, max_value)
+            logger.info(f"Données de {schema_name}.{table_name} sauvegardées dans {output_file} ({rows} lignes).")
+        return rows
     except Exception as e:
+        if sink is not None:
+            sink.abort()
+            if sink.path != output_file and os.path.exists(sink.path):
+                os.remove(sink.path)
         logger.error(f"Erreur lors de l'extraction de {schema_name}.{table_name} : {e}")
         raise
 
-if __name__ == "__main__":
+def split_key_range(min_value, max_value, partitions):
+    """
+    Découpe l'intervalle [min_value, max_value] en au plus `partitions` plages contiguës.
+
+    Retourne:
+        list: Couples (borne inférieure incluse, borne supérieure exclue) ; la dernière borne
+              supérieure est `max_value + 1`.
+    """
+    span = max_value - min_value + 1
+    partitions = max(1, min(partitions, span))
+    step = -(-span // partitions)
+    return [(low, min(low + step, max_value + 1)) for low in range(min_value, max_value + 1, step)]
+
+def extract_table_partitioned(pool, catalog, table_name, schema_name, output_dir, partitions,
+                              batch_size=10000, watermarks=None, watermark_column="ModifiedDate",
+                              output_format=None):
+    """
+    Extrait une table volumineuse en lisant plusieurs plages de clés en parallèle.
+
+    La table est découpée en `partitions` plages sur une colonne entière de sa clé
+    primaire. Chaque plage est lue sur sa propre connexion du pool et écrite dans un
+    fichier partiel, puis les fichiers partiels sont assemblés dans l'ordre des clés.
+    Les tables sans clé entière sont extraites normalement, sur une seule connexion.
+
+    Arguments:
+        pool (ConnectionPool): Pool de connexions partagé.
+        catalog (Catalog): Instantané du catalogue.
+        table_name (str): Nom de la table à extraire.
+        schema_name (str): Nom du schéma contenant la table.
+        output_dir (str): Répertoire où enregistrer le fichier.
+        partitions (int): Nombre de plages lues en parallèle.
+        batch_size (int): Nombre de lignes lues par lot.
+        watermarks (WatermarkStore): Marques du mode incrémental, mises à jour après l'export.
+        watermark_column (str): Colonne de suivi des modifications.
+        output_format (str): "csv" ou "parquet" ; OUTPUT_FORMAT par défaut.
+
+    Retourne:
+        int: Nombre de lignes exportées.
+
+    Lève:
+        Exception: Si une erreur survient lors de l'extraction, elle est journalisée et levée.
+    """
+    output_format = output_format or get_output_format()
+    key = catalog.partition_key(schema_name, table_name)
+    compatible_columns = catalog.compatible_columns(schema_name, table_name)
+    if key is None or not compatible_columns:
+        with pool.connection() as connection:
+            return extract_table_to_csv(
+                connection, table_name, schema_name, output_dir, batch_size, watermarks, watermark_column,
+                catalog, output_format
+            )
+
+    column_list = ', '.join([f"[{col}]" for col in compatible_columns])
+    query = f"SELECT {column_list} FROM {schema_name}.{table_name} WHERE [{key}] >= ? AND [{key}] < ?"
+    base_path = os.path.join(output_dir, schema_name, table_name)
+    output_file = output_path(base_path, output_format)
+    schema = sql_schema(catalog.columns(schema_name, table_name))
+    os.makedirs(os.path.join(output_dir, schema_name), exist_ok=True)
+    tracked_column = watermark_column if watermarks is not None and watermark_column in compatible_columns else None
+
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        try:
+            min_value, max_value = cursor.execute(
+                f"SELECT MIN([{key}]), MAX([{key}]) FROM {schema_name}.{table_name}"
+            ).fetchone()
+        finally:
+            cursor.close()
+    if min_value is None:
+        logger.warning(f"La table {schema_name}.{table_name} est vide. Aucune donnée à sauvegarder.")
+        return 0
+
+    ranges = split_key_range(int(min_value), int(max_value), partitions)
+    part_bases = [f"{base_path}.part-{index:04d}" for index in range(len(ranges))]
+    part_files = [output_path(part_base, output_format) for part_base in part_bases]
+    temp_file = f"{output_file}.tmp"
+
+    def extract_range(part_base, key_range):
+        with metrics.timer("sql", "query", f"{schema_name}.{table_name}{list(key_range)}") as timer:
+            with pool.connection() as connection, \
+                    open_sink(part_base, output_format, compatible_columns, schema) as sink:
+                part_rows, part_max, _ = write_query_to_sink(connection, query, sink, batch_size, key_range, tracked_column)
+            timer.add(bytes=os.path.getsize(sink.path), rows=part_rows)
+        return part_rows, part_max
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            results = list(executor.map(extract_range, part_bases, ranges))
+
+        # Assemble les fichiers partiels dans l'ordre des clés
+        with metrics.timer("sql", "stitch", f"{schema_name}.{table_name}") as timer:
+            if output_format == "parquet":
+                with open_sink(base_path, output_format, schema=schema) as sink:
+                    for part_file in part_files:
+                        for batch in pq.ParquetFile(part_file).iter_batches():
+                            sink.write_batch(batch)
+            else:
+                # En CSV, les octets sont recopiés tels quels, avec un seul en-tête
+                with open(temp_file, "wb") as target:
+                    for index, part_file in enumerate(part_files):
+                        with open(part_file, "rb") as source:
+                            header = source.readline()
+                            if index == 0:
+                                target.write(header)
+                            shutil.copyfileobj(source, target, 1024 * 1024)
+                os.replace(temp_file, output_file)
+            timer.add(bytes=os.path.getsize(output_file))
+
+        rows = sum(part_rows for part_rows, _ in results)
+        max_values = [part_max for _, part_max in results if part_max is not None]
+        if tracked_column and max_values:
+            watermarks.set(schema_name, table_name, tracked_column, max(max_values))
+        logger.info(
+            f"Données de {schema_name}.{table_name} sauvegardées dans {output_file} "
+            f"({rows} lignes, {len(ranges)} plages sur [{key}])."
+        )
+        return rows
+    except Exception as e:
+        logger.error(f"Erreur lors de l'extraction partitionnée de {schema_name}.{table_name} : {e}")
+        raise
+    finally:
+        for path in part_files + [temp_file]:
+            if os.path.exists(path):
+                os.remove(path)
+
+def extract_tables_in_parallel(pool, tables, output_dir, batch_size=10000, catalog=None, watermarks=None,
+                               partitions=1, partition_min_rows=1000000, output_format=None):
+    """
+    Extrait plusieurs tables en parallèle, chacune sur une connexion empruntée au pool.
+
+    Les tables sont planifiées de la plus volumineuse à la plus petite, pour que la
+    table la plus longue démarre en premier et ne retarde pas la fin de l'extraction.
+
+    Arguments:
+        pool (ConnectionPool): Pool de connexions partagé.
+        tables (list): Couples (schéma, table) à extraire.
+        output_dir (str): Répertoire où enregistrer les fichiers.
+        batch_size (int): Nombre de lignes lues par lot.
+        catalog (Catalog): Instantané du catalogue (colonnes, clés et nombres de lignes pour l'ordonnancement).
+        watermarks (WatermarkStore): Marques des extractions précédentes, pour le mode incrémental.
+        partitions (int): Nombre de plages de clés lues en parallèle pour les tables volumineuses.
+        partition_min_rows (int): Nombre de lignes à partir duquel une table est découpée en plages.
+        output_format (str): "csv" ou "parquet" ; OUTPUT_FORMAT par défaut.
+
+    Retourne:
+        tuple: (dict des durées par table, dict des erreurs par table).
+    """
+    output_format = output_format or get_output_format()
+    row_counts = catalog.row_counts() if catalog is not None else {}
+    ordered = sorted(tables, key=lambda table: row_counts.get(table, 0), reverse=True)
+    timings = {}
+    errors = {}
+
+    def extract(schema, table):
+        start = time.perf_counter()
+        # Les tables volumineuses sans marque incrémentale sont lues par plages sur plusieurs connexions
+        if partitions > 1 and catalog is not None and row_counts.get((schema, table), 0) >= partition_min_rows \
+                and (watermarks is None or watermarks.get(schema, table, "ModifiedDate") is None):
+            rows = extract_table_partitioned(
+                pool, catalog, table, schema, output_dir, partitions, batch_size, watermarks,
+                output_format=output_format
+            )
+            return rows, time.perf_counter() - start
+        with pool.connection() as connection:
+            rows = extract_table_to_csv(
+                connection, table, schema, output_dir, batch_size, watermarks,
+                catalog=catalog, output_format=output_format
+            )
+        return rows, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=pool.max_size) as executor:
+        futures = {executor.submit(extract, schema, table): (schema, table) for schema, table in ordered}
+        for future in as_completed(futures):
+            schema, table = futures[future]
+            try:
+                rows, elapsed = future.result()
+                timings[(schema, table)] = elapsed
+                logger.info(f"{schema}.{table} extraite en {elapsed:.2f} s ({rows or 0} lignes).")
+            except Exception as e:
+                errors[(schema, table)] = e
+
+    logger.info(
+        f"{len(timings)} tables extraites en {time.perf_counter() - start:.2f} s "
+        f"avec {pool.max_size} connexions, {len(errors)} en échec."
+    )
+    return timings, errors
+
+def main(schemas=None, output_dir="./data/azure"):
+    """
+    Extrait les tables des schémas ciblés vers des fichiers CSV ou Parquet (OUTPUT_FORMAT), en parallèle.
+
+    Arguments:
+        schemas (list): Schémas à traiter (par défaut : Production, Sales et Person).
+        output_dir (str): Répertoire de destination des fichiers.
+
+    Retourne:
+        dict: Erreurs d'extraction par (schéma, table).
+    """
     # Variables d'environnement
     server = os.getenv("SERVER")
     database = os.getenv("DATABASE")
     username = os.getenv("USERNAME")
     password = os.getenv("PASSWORD")
-    schemas = ["Production", "Sales", "Person"]  # Liste des schémas à traiter
-    output_dir = "./data/azure"  # Répertoire de destination pour les CSV
+    schemas = schemas or ["Production", "Sales", "Person"]  # Liste des schémas à traiter
+    batch_size = int(os.getenv("SQL_BATCH_SIZE", "10000"))  # Nombre de lignes lues par lot
+    max_connections = int(os.getenv("SQL_MAX_CONNECTIONS", "4"))  # Nombre de tables extraites simultanément
+    incremental = os.getenv("SQL_INCREMENTAL", "0") == "1"  # Extraction des seules lignes modifiées (ModifiedDate)
+    partitions = int(os.getenv("SQL_PARTITIONS", str(max_connections)))  # Plages lues en parallèle par grande table
+    partition_min_rows = int(os.getenv("SQL_PARTITION_MIN_ROWS", "1000000"))  # Seuil de découpage en plages
+    output_format = get_output_format()  # Format des fichiers exportés (csv ou parquet)
 
     # Vérifie que toutes les variables nécessaires sont définies
     if not all([server, database, username, password]):
@@ -172,15 +574,30 @@ if __name__ == "__main__":
         raise ValueError("Une ou plusieurs variables d'environnement sont manquantes.")
 
     logger.info(f"Connexion avec les paramètres : SERVER={server}, DATABASE={database}")
-    conn = connect_to_sql_server(server, database, username, password)
+    pool = ConnectionPool(lambda: connect_to_sql_server(server, database, username, password), max_connections)
+
+    try:
+        # Récupère en une requête les tables, colonnes, clés et volumétries de tous les schémas
+        with metrics.timer("sql", "catalog"), pool.connection() as conn:
+            catalog = load_catalog(conn, schemas, os.path.join(".", "data", ".cache", "sql_catalog.json"))
+        tables = [(schema, table) for schema in schemas for table in catalog.tables_in_schema(schema)]
 
+        watermarks = WatermarkStore(os.path.join(output_dir, ".watermarks.json")) if incremental else None
+        _, errors = extract_tables_in_parallel(
+            pool, tables, output_dir, batch_size, catalog, watermarks, partitions, partition_min_rows,
+            output_format
+        )
+        return errors
+    finally:
+        # Ferme les connexions à la base de données après traitement
+        pool.close()
+        logger.info("Connexions fermées.")
+
+if __name__ == "__main__":
     try:
-        # Pour chaque schéma, récupère les tables et extrait les données
-        for schema in schemas:
-            tables = get_tables_in_schema(conn, schema)
-            for table in tables:
-                extract_table_to_csv(conn, table, schema, output_dir)
+        errors = main()
     finally:
-        # Ferme la connexion à la base de données après traitement
-        conn.close()
-        logger.info("Connexion fermée.")
\ No newline at end of file
+        metrics.write_report("sql")
+    # Code de sortie non nul si des tables sont en échec (main.sh, benchmarks)
+    if errors:
+        sys.exit(1)
@@ -0,0 +1,168 @@
+import os
+import io
+import hashlib
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow.parquet as pq
+from PIL import Image
+
+# Signature des fichiers PNG : ces images peuvent être écrites telles quelles
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def save_images(items, image_dir, passthrough=True):
+    """
+    Enregistre un lot d'images au format PNG (exécuté dans un processus du pool).
+
+    Arguments:
+        items (list): Couples (item_ID, octets de l'image).
+        image_dir (str): Répertoire de destination des images.
+        passthrough (bool): Écrit directement les octets des images déjà au format PNG, sans réencodage.
+
+    Retourne:
+        tuple: (nombre d'images réencodées, nombre d'images copiées telles quelles).
+    """
+    encoded = copied = 0
+    for item_id, image_data in items:
+        if image_data is None:
+            continue
+        image_name = os.path.join(image_dir, f"{item_id}.png")
+        if passthrough and image_data[:8] == PNG_SIGNATURE:
+            with open(image_name, "wb") as file:
+                file.write(image_data)
+            copied += 1
+        else:
+            Image.open(io.BytesIO(image_data)).save(image_name, format="PNG")
+            encoded += 1
+    return encoded, copied
+
+
+def encode_images(items, passthrough=True):
+    """
+    Convertit un lot d'images en PNG et calcule leur empreinte (exécuté dans un processus du pool).
+
+    Arguments:
+        items (list): Couples (item_ID, octets de l'image).
+        passthrough (bool): Conserve les octets des images déjà au format PNG, sans réencodage.
+
+    Retourne:
+        tuple: (triplets (item_ID, empreinte SHA-256, octets PNG), nombre d'images réencodées,
+                nombre d'images conservées telles quelles).
+    """
+    records = []
+    encoded = copied = 0
+    for item_id, image_data in items:
+        if image_data is None:
+            continue
+        if passthrough and image_data[:8] == PNG_SIGNATURE:
+            copied += 1
+        else:
+            buffer = io.BytesIO()
+            Image.open(io.BytesIO(image_data)).save(buffer, format="PNG")
+            image_data = buffer.getvalue()
+            encoded += 1
+        records.append((item_id, hashlib.sha256(image_data).hexdigest(), image_data))
+    return records, encoded, copied
+
+
+def create_pool(max_workers=None):
+    """
+    Crée le pool de processus d'encodage des images, à partager entre les fichiers d'une exécution
+    (le démarrage des interpréteurs et l'import de PIL et pyarrow ne sont payés qu'une fois).
+
+    Les processus sont démarrés par "spawn" : un fork du processus parent, qui exécute déjà
+    plusieurs threads (extraction SQL, écriture des logs, pools HTTP), peut hériter de verrous détenus.
+
+    Arguments:
+        max_workers (int): Nombre de processus (par défaut : nombre de cœurs).
+    """
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+
+def export_images(parquet_source, image_dir, max_workers=None, passthrough=True, batch_size=256, shard_writer=None,
+                  executor=None):
+    """
+    Extrait les images d'un fichier Parquet et les enregistre en PNG, en parallèle sur plusieurs cœurs.
+
+    Seules les colonnes `item_ID` et `image` sont lues, lot par lot, directement depuis
+    Arrow (sans construire de Series pandas par ligne). Les lots sont répartis sur un
+    pool de processus qui décode et encode les images ; le nombre de lots en attente est
+    borné pour que la mémoire reste proportionnelle à `batch_size`.
+
+    Avec `shard_writer`, les processus retournent les PNG et leur empreinte au lieu
+    d'écrire un fichier par image, et les images sont ajoutées séquentiellement aux shards.
+
+    Arguments:
+        parquet_source (str | file): Chemin ou fichier Parquet lisible par pyarrow.
+        image_dir (str): Répertoire de destination des images (un fichier par image).
+        max_workers (int): Nombre de processus (par défaut : nombre de cœurs).
+        passthrough (bool): Écrit les PNG existants sans les réencoder.
+        batch_size (int): Nombre d'images par lot envoyé à un processus.
+        shard_writer (ShardWriter): Shards de destination ; remplace `image_dir` s'il est fourni.
+        executor (ProcessPoolExecutor): Pool partagé (`create_pool`) ; un pool dédié est créé s'il est absent.
+
+    Retourne:
+        tuple: (nombre d'images enregistrées, sorties qui les contiennent : le répertoire des
+                images, ou les shards et leur index). (0, []) si le fichier ne contient pas de colonne `image`.
+
+    Lève:
+        Exception: Si la lecture du fichier ou l'enregistrement d'une image échoue.
+    """
+    parquet_file = pq.ParquetFile(parquet_source)
+    if "image" not in parquet_file.schema_arrow.names:
+        return 0, []
+
+    if shard_writer is None:
+        os.makedirs(image_dir, exist_ok=True)
+    max_workers = max_workers or os.cpu_count() or 1
+    encoded = copied = 0
+    pending = deque()
+    # Shards contenant les images du fichier, dans l'ordre de première écriture
+    outputs = {}
+
+    def collect(future):
+        nonlocal encoded, copied
+        if shard_writer is None:
+            batch_encoded, batch_copied = future.result()
+        else:
+            records, batch_encoded, batch_copied = future.result()
+            for shard in shard_writer.add_many(records):
+                outputs.setdefault(os.path.join(shard_writer.directory, shard))
+        encoded += batch_encoded
+        copied += batch_copied
+
+    own_executor = executor is None
+    if own_executor:
+        executor = create_pool(max_workers)
+    try:
+        for record_batch in parquet_file.iter_batches(batch_size=batch_size, columns=["item_ID", "image"]):
+            item_ids = record_batch.column("item_ID").to_pylist()
+            images = record_batch.column("image").field("bytes").to_pylist()
+            items = list(zip(item_ids, images))
+            if shard_writer is None:
+                pending.append(executor.submit(save_images, items, image_dir, passthrough))
+            else:
+                pending.append(executor.submit(encode_images, items, passthrough))
+            # Limite le nombre de lots en attente pour borner la mémoire
+            while len(pending) > 2 * max_workers:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+    except Exception as e:
+        logging.error(f"Erreur lors de l'export des images : {e}")
+        raise
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    destination = shard_writer.directory if shard_writer is not None else image_dir
+    logging.info(f"{encoded + copied} images sauvegardées dans {destination} ({encoded} réencodées, {copied} copiées).")
+    if shard_writer is None:
+        return encoded + copied, [image_dir] if encoded + copied else []
+    if outputs:
+        outputs.setdefault(shard_writer.index_path)
+    return encoded + copied, list(outputs)
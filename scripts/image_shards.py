@@ -0,0 +1,227 @@
+import os
+import re
+import sqlite3
+import tarfile
+import threading
+
+# Taille d'un bloc tar et marqueur de fin d'archive (deux blocs nuls)
+TAR_BLOCK_SIZE = 512
+TAR_END = b"\0" * (2 * TAR_BLOCK_SIZE)
+
+# Nom des fichiers de shards : images-000000.tar, images-000001.tar, ...
+SHARD_PATTERN = re.compile(r"^images-(\d{6})\.tar$")
+
+INDEX_NAME = "index.sqlite"
+
+
+def _connect(directory):
+    conn = sqlite3.connect(os.path.join(directory, INDEX_NAME), timeout=60, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS images ("
+        "digest TEXT PRIMARY KEY, shard TEXT NOT NULL, offset INTEGER NOT NULL, size INTEGER NOT NULL)"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS items (item_id TEXT PRIMARY KEY, digest TEXT NOT NULL)")
+    conn.commit()
+    return conn
+
+
+class ShardWriter:
+    """
+    Écrit des images dans de gros fichiers tar séquentiels (shards), indexés par item_ID.
+
+    Chaque image est un membre `<sha256>.png` du shard courant ; un nouveau shard est
+    ouvert lorsque le courant atteint `shard_size` octets. Une image déjà présente
+    (même empreinte SHA-256) n'est pas réécrite : seul son item_ID est ajouté à l'index.
+
+    L'index SQLite (`index.sqlite`) associe chaque item_ID à l'empreinte de son image,
+    et chaque empreinte au shard, à la position et à la taille de ses octets. Il n'est
+    validé qu'après l'écriture des octets qu'il référence, et chaque shard se termine
+    toujours par un marqueur de fin d'archive : après une interruption, les shards
+    restent lisibles par `tar` et l'index ne pointe que vers des données complètes.
+    Les shards des exécutions précédentes ne sont jamais modifiés.
+    """
+
+    def __init__(self, directory, shard_size=1024 * 1024 * 1024):
+        """
+        Arguments:
+            directory (str): Répertoire des shards et de leur index.
+            shard_size (int): Taille (octets) au-delà de laquelle un nouveau shard est ouvert.
+        """
+        self.directory = directory
+        self.shard_size = shard_size
+        os.makedirs(directory, exist_ok=True)
+        self._conn = _connect(directory)
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        existing = [int(match.group(1)) for match in map(SHARD_PATTERN.match, os.listdir(directory)) if match]
+        self._next_number = max(existing, default=-1) + 1
+        self._file = None
+        self._shard = None
+        self._position = 0
+        self.written = 0
+        self.deduplicated = 0
+
+    def _finish_shard(self):
+        # Marqueur de fin d'archive à la position courante, écrasé par un éventuel lot suivant
+        self._file.seek(self._position)
+        self._file.write(TAR_END)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _open_next_shard(self):
+        if self._file is not None:
+            self._finish_shard()
+            self._file.close()
+        self._shard = f"images-{self._next_number:06d}.tar"
+        self._next_number += 1
+        self._file = open(os.path.join(self.directory, self._shard), "wb")
+        self._position = 0
+
+    def add_many(self, records):
+        """
+        Ajoute un lot d'images.
+
+        Arguments:
+            records (list): Triplets (item_ID, empreinte SHA-256 hexadécimale, octets PNG).
+
+        Retourne:
+            list: Noms des shards contenant les images du lot (nouvelles ou déjà présentes).
+        """
+        known = {}
+        digests = list({digest for _, digest, _ in records})
+        for start in range(0, len(digests), 500):
+            chunk = digests[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            known.update(self._conn.execute(
+                f"SELECT digest, shard FROM images WHERE digest IN ({placeholders})", chunk
+            ))
+
+        new_images = []
+        for _, digest, data in records:
+            if digest in known:
+                self.deduplicated += 1
+                continue
+            if self._file is None or self._position >= self.shard_size:
+                self._open_next_shard()
+            info = tarfile.TarInfo(f"{digest}.png")
+            info.size = len(data)
+            header = info.tobuf(format=tarfile.USTAR_FORMAT)
+            padding = -len(data) % TAR_BLOCK_SIZE
+            self._file.seek(self._position)
+            self._file.write(header)
+            self._file.write(data)
+            self._file.write(b"\0" * padding)
+            new_images.append((digest, self._shard, self._position + len(header), len(data)))
+            known[digest] = self._shard
+            self._position += len(header) + len(data) + padding
+            self.written += 1
+
+        if self._file is not None:
+            # Le marqueur de fin est réécrit après chaque lot, avant la validation de l'index
+            self._finish_shard()
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO images VALUES (?, ?, ?, ?)", new_images)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO items VALUES (?, ?)",
+                [(str(item_id), digest) for item_id, digest, _ in records],
+            )
+        return sorted({known[digest] for _, digest, _ in records})
+
+    def close(self):
+        if self._file is not None:
+            self._finish_shard()
+            self._file.close()
+            self._file = None
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+class ShardReader:
+    """
+    Accès direct aux images écrites par `ShardWriter`.
+
+    Une image est lue par une requête sur l'index puis une seule lecture positionnée
+    (`os.pread`) dans son shard, quel que soit le nombre d'images : le coût ne dépend
+    ni de la taille des shards ni de la position de l'image. Le lecteur peut être
+    partagé entre plusieurs threads.
+
+        with ShardReader("./data/parquet/shards") as reader:
+            png = reader.get("12345")
+    """
+
+    def __init__(self, directory):
+        """
+        Arguments:
+            directory (str): Répertoire des shards et de leur index.
+        """
+        self.directory = directory
+        self._conn = _connect(directory)
+        self._lock = threading.Lock()
+        self._descriptors = {}
+
+    def locate(self, item_id):
+        """
+        Retourne (shard, position, taille) de l'image d'un item_ID.
+
+        Lève:
+            KeyError: Si l'item_ID n'a pas d'image.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT images.shard, images.offset, images.size FROM items "
+                "JOIN images ON images.digest = items.digest WHERE items.item_id = ?",
+                (str(item_id),),
+            ).fetchone()
+        if row is None:
+            raise KeyError(item_id)
+        return row
+
+    def _descriptor(self, shard):
+        with self._lock:
+            descriptor = self._descriptors.get(shard)
+            if descriptor is None:
+                descriptor = self._descriptors[shard] = os.open(os.path.join(self.directory, shard), os.O_RDONLY)
+            return descriptor
+
+    def get(self, item_id):
+        """
+        Retourne les octets PNG de l'image d'un item_ID.
+
+        Lève:
+            KeyError: Si l'item_ID n'a pas d'image.
+        """
+        shard, offset, size = self.locate(item_id)
+        return os.pread(self._descriptor(shard), size, offset)
+
+    def __contains__(self, item_id):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM items WHERE item_id = ?", (str(item_id),)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def item_ids(self):
+        """
+        Retourne la liste des item_ID disposant d'une image.
+        """
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT item_id FROM items ORDER BY item_id")]
+
+    def close(self):
+        with self._lock:
+            for descriptor in self._descriptors.values():
+                os.close(descriptor)
+            self._descriptors = {}
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
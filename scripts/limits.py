@@ -0,0 +1,146 @@
+import os
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+
+
+class TokenBucket:
+    """
+    Seau à jetons limitant un débit (en octets par seconde) partagé entre plusieurs threads.
+
+    Un appel à `consume` qui dépasse les jetons disponibles les emprunte (le solde
+    devient négatif) et attend le temps nécessaire à leur remboursement : un gros
+    segment n'est jamais bloqué indéfiniment, et le débit moyen reste égal à `rate`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Arguments:
+            rate (float): Débit maximal, en octets par seconde.
+            capacity (float): Rafale maximale autorisée, en octets (une seconde de débit par défaut).
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        """
+        Prélève `amount` octets et attend si le débit maximal est dépassé.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class ThrottledWriter:
+    """
+    Enveloppe d'un fichier dont chaque écriture est décomptée d'un seau à jetons.
+    Les autres attributs (seek, tell, seekable, ...) sont délégués au fichier.
+    """
+
+    def __init__(self, file, bucket):
+        self._file = file
+        self._bucket = bucket
+
+    def write(self, data):
+        self._bucket.consume(len(data))
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class Limits:
+    """
+    Limites globales partagées par toutes les étapes d'une exécution : nombre
+    d'opérations d'extraction simultanées (téléchargements de blobs, requêtes SQL)
+    et débit réseau total des téléchargements.
+    """
+
+    def __init__(self, max_concurrency=0, max_bandwidth=0):
+        """
+        Arguments:
+            max_concurrency (int): Nombre maximal d'opérations simultanées (0 : illimité).
+            max_bandwidth (float): Débit maximal en octets par seconde (0 : illimité).
+        """
+        self.max_concurrency = max_concurrency
+        self.max_bandwidth = max_bandwidth
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._bucket = TokenBucket(max_bandwidth) if max_bandwidth else None
+
+    def slot(self):
+        """
+        Gestionnaire de contexte occupant un emplacement d'opération simultanée.
+        """
+        if self._slots is None:
+            return nullcontext()
+        return self._held_slot()
+
+    @contextmanager
+    def _held_slot(self):
+        with self._slots:
+            yield
+
+    def throttle(self, amount):
+        """
+        Décompte `amount` octets transférés du débit global.
+        """
+        if self._bucket is not None:
+            self._bucket.consume(amount)
+
+    def wrap_writer(self, file):
+        """
+        Retourne le fichier, enveloppé pour limiter le débit de ses écritures si nécessaire.
+        """
+        return ThrottledWriter(file, self._bucket) if self._bucket is not None else file
+
+
+_limits = None
+_limits_lock = threading.Lock()
+
+
+def _limits_from_env(max_concurrency=None, max_bandwidth_mbps=None):
+    if max_concurrency is None:
+        max_concurrency = int(os.getenv("PIPELINE_MAX_CONCURRENCY", "0"))
+    if max_bandwidth_mbps is None:
+        max_bandwidth_mbps = float(os.getenv("PIPELINE_MAX_BANDWIDTH_MBPS", "0"))
+    return Limits(max_concurrency, max_bandwidth_mbps * 1024 * 1024)
+
+
+def configure(max_concurrency=None, max_bandwidth_mbps=None):
+    """
+    Définit les limites globales du processus, avant le démarrage des étapes.
+
+    Les valeurs absentes sont lues dans PIPELINE_MAX_CONCURRENCY et
+    PIPELINE_MAX_BANDWIDTH_MBPS (Mo/s) ; 0 signifie « sans limite ».
+
+    Retourne:
+        Limits: Limites en vigueur.
+    """
+    global _limits
+    with _limits_lock:
+        _limits = _limits_from_env(max_concurrency, max_bandwidth_mbps)
+        return _limits
+
+
+def get_limits():
+    """
+    Retourne les limites globales, lues dans l'environnement au premier appel si
+    `configure` n'a pas été appelée (exécution d'un script seul).
+    """
+    global _limits
+    with _limits_lock:
+        if _limits is None:
+            _limits = _limits_from_env()
+        return _limits
+
+
+def throttle(amount):
+    get_limits().throttle(amount)
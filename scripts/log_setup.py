@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import multiprocessing
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+
+# Format des enregistrements : "json" (un objet par ligne) ou "text"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+# Niveau minimal journalisé
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Rotation des fichiers de logs : taille maximale d'un fichier et nombre de fichiers conservés
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+
+# Intervalle (secondes) entre deux résumés d'événements par élément
+LOG_SUMMARY_INTERVAL = float(os.getenv("LOG_SUMMARY_INTERVAL", "30"))
+
+# Un élément sur N est journalisé individuellement au niveau INFO (0 : uniquement au niveau DEBUG)
+LOG_ITEM_SAMPLE_EVERY = int(os.getenv("LOG_ITEM_SAMPLE_EVERY", "0"))
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(threadName)s - %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formate un enregistrement en objet JSON sur une ligne. Les champs passés par
+    `extra={"fields": {...}}` sont ajoutés à l'objet.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Les enregistrements ne quittent pas le processus : leur formatage (message, exception)
+        # est entièrement laissé au thread d'écriture
+        return record
+
+
+_listener = None
+_lock = threading.Lock()
+
+
+def configure(log_file, level=None):
+    """
+    Configure la journalisation du processus : les threads d'extraction déposent leurs
+    enregistrements dans une file, et un thread d'arrière-plan les formate et les écrit
+    dans `log_file` (avec rotation).
+
+    Seul le premier appel du processus est pris en compte : lorsque le pipeline importe
+    les scripts d'extraction, sa configuration reste celle de tous les scripts. Les
+    processus enfants (pool d'encodage des images), qui réimportent le script lancé,
+    n'ouvrent pas le fichier de logs du parent.
+
+    Arguments:
+        log_file (str): Chemin du fichier de logs.
+        level (str): Niveau minimal ; LOG_LEVEL par défaut.
+    """
+    global _listener
+    # Nom attribué au processus enfant avant la réimportation du script (parent_process() n'est pas encore défini)
+    if multiprocessing.current_process().name != "MainProcess":
+        return
+    with _lock:
+        if _listener is not None:
+            return
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_QueueHandler(log_queue))
+        root.setLevel(level or LOG_LEVEL)
+        # Le SDK Azure journalise chaque requête HTTP au niveau INFO
+        logging.getLogger("azure").setLevel(logging.WARNING)
+
+        _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def shutdown():
+    """
+    Émet les derniers résumés, vide la file et arrête le thread d'écriture.
+    """
+    global _listener
+    flush_items()
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+class ItemLog:
+    """
+    Journalisation agrégée d'un événement répété pour chaque élément (blob, fichier, image).
+
+    Au lieu d'un enregistrement par élément, les éléments sont comptés (avec leurs octets
+    et lignes) et un résumé est émis au plus toutes les LOG_SUMMARY_INTERVAL secondes,
+    puis à la fin de l'étape (`flush`). Chaque élément reste visible au niveau DEBUG, et
+    LOG_ITEM_SAMPLE_EVERY=N en journalise un sur N au niveau INFO.
+    """
+
+    def __init__(self, event, logger=None, interval=None, sample_every=None):
+        """
+        Arguments:
+            event (str): Libellé de l'événement (ex : "Fichiers téléchargés").
+            logger (logging.Logger): Logger utilisé (racine par défaut).
+            interval (float): Intervalle entre deux résumés (secondes).
+            sample_every (int): Fréquence d'échantillonnage des éléments au niveau INFO.
+        """
+        self.event = event
+        self.logger = logger or logging.getLogger()
+        self.interval = LOG_SUMMARY_INTERVAL if interval is None else interval
+        self.sample_every = LOG_ITEM_SAMPLE_EVERY if sample_every is None else sample_every
+        self._lock = threading.Lock()
+        self._total = 0
+        self._reset(time.monotonic())
+
+    def _reset(self, now):
+        self._count = 0
+        self._bytes = 0
+        self._rows = 0
+        self._since = now
+
+    def record(self, item, bytes=0, rows=0):
+        """
+        Comptabilise un élément traité.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._count += 1
+            self._total += 1
+            self._bytes += bytes
+            self._rows += rows
+            sampled = self.sample_every > 0 and self._total % self.sample_every == 0
+            summary = self._take_summary(now) if now - self._since >= self.interval else None
+        if sampled:
+            self.logger.info(f"{self.event} : {item}", extra={"fields": {"event": self.event, "item": str(item)}})
+        elif self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"{self.event} : {item}", extra={"fields": {"event": self.event, "item": str(item)}})
+        if summary:
+            self._emit(summary)
+
+    def _take_summary(self, now):
+        if not self._count:
+            return None
+        summary = {
+            "event": self.event, "count": self._count, "total": self._total,
+            "bytes": self._bytes, "rows": self._rows, "seconds": round(now - self._since, 3),
+        }
+        self._reset(now)
+        return summary
+
+    def _emit(self, summary):
+        details = []
+        if summary["bytes"]:
+            details.append(f"{summary['bytes'] / (1024 * 1024):.1f} Mo")
+        if summary["rows"]:
+            details.append(f"{summary['rows']} lignes")
+        suffix = f" ({', '.join(details)})" if details else ""
+        self.logger.info(
+            f"{self.event} : {summary['count']} en {summary['seconds']:.1f} s{suffix}, {summary['total']} au total",
+            extra={"fields": summary},
+        )
+
+    def flush(self):
+        """
+        Émet le résumé des éléments comptabilisés depuis le précédent.
+        """
+        with self._lock:
+            summary = self._take_summary(time.monotonic())
+        if summary:
+            self._emit(summary)
+
+
+_item_logs = {}
+
+
+def item_log(event, logger=None):
+    """
+    Retourne le journal agrégé d'un événement, partagé par tous les threads du processus.
+    """
+    with _lock:
+        if event not in _item_logs:
+            _item_logs[event] = ItemLog(event, logger)
+        return _item_logs[event]
+
+
+def flush_items():
+    """
+    Émet le résumé en cours de tous les journaux agrégés (fin d'une étape).
+    """
+    with _lock:
+        logs = list(_item_logs.values())
+    for log in logs:
+        log.flush()
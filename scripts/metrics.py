@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime, timezone
+
+# Instrumentation activée par défaut ; METRICS_ENABLED=0 réduit chaque point de mesure à un test booléen
+ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Répertoire des rapports (JSON horodatés et fichiers texte Prometheus)
+METRICS_DIR = os.getenv("METRICS_DIR", "./logs/metrics")
+
+# Nombre maximal de mesures par objet (blob, table, fichier) conservées pour le rapport JSON
+MAX_OBJECTS = int(os.getenv("METRICS_MAX_OBJECTS", "10000"))
+
+
+class _Phase:
+    """
+    Agrégat des mesures d'une phase (ex : sql/query, csv/download).
+
+    `count` est le nombre de mesures (une par objet ou opération) ; `items` compte
+    les éléments déclarés explicitement (ex : blobs parcourus par le listing, images).
+    `seconds` cumule la durée de chaque mesure (temps occupé, sommé sur les threads) ;
+    `first_start` et `last_end` donnent la durée murale de la phase.
+    """
+
+    __slots__ = ("count", "seconds", "bytes", "rows", "items", "first_start", "last_end")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.rows = 0
+        self.items = 0
+        self.first_start = None
+        self.last_end = None
+
+    def to_dict(self):
+        wall = (self.last_end - self.first_start) if self.first_start is not None else 0.0
+        return {
+            "count": self.count,
+            "busy_seconds": round(self.seconds, 6),
+            "wall_seconds": round(wall, 6),
+            "bytes": self.bytes,
+            "rows": self.rows,
+            "items": self.items,
+            "bytes_per_second": round(self.bytes / wall, 1) if wall > 0 else None,
+            "rows_per_second": round(self.rows / wall, 1) if wall > 0 else None,
+        }
+
+
+class _Registry:
+    """
+    Mesures du processus en cours, partagées entre les threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.started = time.perf_counter()
+            self.phases = {}
+            self.objects = []
+            self.objects_dropped = 0
+
+    def record(self, stage, phase, item, start, end, bytes, rows, items):
+        with self._lock:
+            aggregate = self.phases.get((stage, phase))
+            if aggregate is None:
+                aggregate = self.phases[(stage, phase)] = _Phase()
+            aggregate.count += 1
+            aggregate.seconds += end - start
+            aggregate.bytes += bytes
+            aggregate.rows += rows
+            aggregate.items += items
+            if aggregate.first_start is None or start < aggregate.first_start:
+                aggregate.first_start = start
+            if aggregate.last_end is None or end > aggregate.last_end:
+                aggregate.last_end = end
+            if item is not None:
+                if len(self.objects) < MAX_OBJECTS:
+                    self.objects.append({
+                        "stage": stage, "phase": phase, "item": str(item),
+                        "seconds": round(end - start, 6), "bytes": bytes, "rows": rows,
+                    })
+                else:
+                    self.objects_dropped += 1
+
+
+_registry = _Registry()
+
+
+class Timer:
+    """
+    Mesure d'une opération, utilisée comme gestionnaire de contexte :
+
+        with metrics.timer("csv", "download", blob_name) as timer:
+            size = ...
+            timer.add(bytes=size)
+
+    La mesure est enregistrée à la sortie du bloc, même en cas d'exception.
+    """
+
+    __slots__ = ("stage", "phase", "item", "bytes", "rows", "items", "_start")
+
+    def __init__(self, stage, phase, item=None):
+        self.stage = stage
+        self.phase = phase
+        self.item = item
+        self.bytes = 0
+        self.rows = 0
+        self.items = 0
+
+    def add(self, bytes=0, rows=0, items=0):
+        self.bytes += bytes
+        self.rows += rows
+        self.items += items
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        _registry.record(self.stage, self.phase, self.item, self._start, time.perf_counter(),
+                         self.bytes, self.rows, self.items)
+
+
+class _NoopTimer:
+    """
+    Mesure inactive retournée lorsque l'instrumentation est désactivée.
+    """
+
+    __slots__ = ()
+
+    def add(self, bytes=0, rows=0, items=0):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        pass
+
+
+_NOOP = _NoopTimer()
+
+
+def timer(stage, phase, item=None):
+    """
+    Retourne une mesure de durée pour une opération d'une phase (inactive si METRICS_ENABLED=0).
+
+    Arguments:
+        stage (str): Étape (ex : "sql", "parquet", "csv").
+        phase (str): Phase de l'étape (ex : "listing", "download", "decode", "write").
+        item (str): Objet traité (blob, table, fichier), pour la mesure par objet.
+    """
+    if not ENABLED:
+        return _NOOP
+    return Timer(stage, phase, item)
+
+
+def record(stage, phase, item=None, seconds=0.0, bytes=0, rows=0, items=0):
+    """
+    Enregistre une mesure déjà calculée (ex : octets d'une lecture par plage).
+    """
+    if not ENABLED:
+        return
+    end = time.perf_counter()
+    _registry.record(stage, phase, item, end - seconds, end, bytes, rows, items)
+
+
+def reset():
+    """
+    Efface les mesures du processus (début d'une nouvelle exécution).
+    """
+    _registry.reset()
+
+
+def snapshot(run_name, extra=None):
+    """
+    Construit le rapport d'exécution à partir des mesures collectées.
+
+    Arguments:
+        run_name (str): Nom de l'exécution (ex : "sql", "pipeline").
+        extra (dict): Informations complémentaires (ex : statut des étapes du pipeline).
+
+    Retourne:
+        dict: Rapport sérialisable en JSON.
+    """
+    with _registry._lock:
+        phases = [
+            {"stage": stage, "phase": phase, **aggregate.to_dict()}
+            for (stage, phase), aggregate in sorted(_registry.phases.items())
+        ]
+        objects = list(_registry.objects)
+        objects_dropped = _registry.objects_dropped
+        started_at = _registry.started_at
+        duration = time.perf_counter() - _registry.started
+    return {
+        "run": run_name,
+        "started_at": datetime.fromtimestamp(started_at, timezone.utc).isoformat(),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "duration_seconds": round(duration, 3),
+        "phases": phases,
+        "objects": objects,
+        "objects_dropped": objects_dropped,
+        **({"extra": extra} if extra else {}),
+    }
+
+
+def to_prometheus(report):
+    """
+    Convertit un rapport d'exécution au format texte de Prometheus (collecteur « textfile » de node_exporter).
+    """
+    run = report["run"]
+    lines = [
+        "# HELP extraction_run_duration_seconds Durée totale de la dernière exécution.",
+        "# TYPE extraction_run_duration_seconds gauge",
+        f'extraction_run_duration_seconds{{run="{run}"}} {report["duration_seconds"]}',
+        "# HELP extraction_run_timestamp_seconds Fin de la dernière exécution (horodatage Unix).",
+        "# TYPE extraction_run_timestamp_seconds gauge",
+        f'extraction_run_timestamp_seconds{{run="{run}"}} {datetime.fromisoformat(report["finished_at"]).timestamp():.0f}',
+    ]
+    series = [
+        ("extraction_phase_busy_seconds", "busy_seconds", "Temps occupé cumulé de la phase, sommé sur les threads."),
+        ("extraction_phase_wall_seconds", "wall_seconds", "Durée murale de la phase."),
+        ("extraction_phase_bytes", "bytes", "Octets traités par la phase."),
+        ("extraction_phase_rows", "rows", "Lignes traitées par la phase."),
+        ("extraction_phase_operations", "count", "Opérations mesurées dans la phase."),
+        ("extraction_phase_items", "items", "Éléments traités par la phase."),
+    ]
+    for metric, key, description in series:
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} gauge")
+        for phase in report["phases"]:
+            labels = f'run="{run}",stage="{phase["stage"]}",phase="{phase["phase"]}"'
+            lines.append(f"{metric}{{{labels}}} {phase[key]}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, content):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(temp_path, path)
+
+
+def write_report(run_name, extra=None, directory=None):
+    """
+    Écrit le rapport JSON horodaté de l'exécution et le fichier texte Prometheus `<run>.prom`.
+
+    Arguments:
+        run_name (str): Nom de l'exécution.
+        extra (dict): Informations complémentaires ajoutées au rapport JSON.
+        directory (str): Répertoire de sortie (METRICS_DIR par défaut).
+
+    Retourne:
+        str: Chemin du rapport JSON, ou None si l'instrumentation est désactivée.
+    """
+    if not ENABLED:
+        return None
+    directory = directory or METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    report = snapshot(run_name, extra)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    json_path = os.path.join(directory, f"{run_name}-{stamp}.json")
+    _write_atomic(json_path, json.dumps(report, indent=2, ensure_ascii=False, default=str))
+    _write_atomic(os.path.join(directory, f"{run_name}.prom"), to_prometheus(report))
+    return json_path
@@ -0,0 +1,343 @@
+import os
+import csv
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# Formats de sortie disponibles pour les trois extracteurs
+OUTPUT_FORMATS = ("csv", "parquet")
+
+
+def sql_type_to_arrow(column):
+    """
+    Convertit la description d'une colonne SQL Server (catalogue) en type Arrow.
+
+    Arguments:
+        column (dict): Colonne du catalogue ("data_type", "precision", "scale").
+
+    Retourne:
+        pyarrow.DataType: Type Arrow correspondant (chaîne de caractères par défaut).
+    """
+    data_type = column["data_type"]
+    if data_type == "bit":
+        return pa.bool_()
+    if data_type == "tinyint":
+        return pa.uint8()
+    if data_type == "smallint":
+        return pa.int16()
+    if data_type == "int":
+        return pa.int32()
+    if data_type == "bigint":
+        return pa.int64()
+    if data_type in ("decimal", "numeric"):
+        return pa.decimal128(column["precision"], column["scale"])
+    if data_type == "money":
+        return pa.decimal128(19, 4)
+    if data_type == "smallmoney":
+        return pa.decimal128(10, 4)
+    if data_type == "float":
+        return pa.float64()
+    if data_type == "real":
+        return pa.float32()
+    if data_type == "date":
+        return pa.date32()
+    if data_type in ("datetime", "datetime2", "smalldatetime"):
+        return pa.timestamp("us")
+    if data_type == "time":
+        return pa.time64("us")
+    if data_type in ("binary", "varbinary", "image", "timestamp", "rowversion"):
+        return pa.binary()
+    return pa.string()
+
+
+def sql_schema(columns):
+    """
+    Construit le schéma Arrow d'une table à partir des colonnes du catalogue.
+    """
+    return pa.schema([
+        pa.field(column["name"], sql_type_to_arrow(column), nullable=column.get("nullable", True))
+        for column in columns
+    ])
+
+
+def rows_to_batch(rows, columns, schema=None):
+    """
+    Convertit une liste de tuples (lignes pyodbc) en RecordBatch Arrow.
+
+    Les valeurs non textuelles des colonnes texte (ex : uniqueidentifier) sont converties en chaînes.
+    """
+    arrays = []
+    for index, name in enumerate(columns):
+        values = [row[index] for row in rows]
+        field_type = schema.field(name).type if schema is not None else None
+        if field_type is not None and pa.types.is_string(field_type):
+            values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+        arrays.append(pa.array(values, type=field_type))
+    if schema is not None:
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+    return pa.RecordBatch.from_arrays(arrays, names=list(columns))
+
+
+class CsvSink:
+    """
+    Sortie CSV écrite au fil de l'eau dans un fichier temporaire, renommé à la fermeture.
+    """
+
+    extension = ".csv"
+
+    def __init__(self, path, columns=None, schema=None):
+        """
+        Arguments:
+            path (str): Chemin final du fichier.
+            columns (list): Noms des colonnes, pour l'écriture de lignes (tuples).
+            schema (pyarrow.Schema): Schéma des lots Arrow, s'il est connu.
+        """
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.columns = list(columns) if columns is not None else (schema.names if schema is not None else None)
+        self.schema = schema
+        self.rows = 0
+        self._file = None
+        self._writer = None
+
+    def write_rows(self, rows):
+        if self._file is None:
+            self._file = open(self.temp_path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.columns)
+        self._writer.writerows(rows)
+        self.rows += len(rows)
+
+    def write_batch(self, batch):
+        if self._writer is None:
+            schema = self.schema or batch.schema
+            # pyarrow ne sait pas écrire les types imbriqués en CSV : ces lots passent par pandas
+            if any(pa.types.is_nested(field.type) for field in schema):
+                self._file = open(self.temp_path, "w", newline="", encoding="utf-8")
+                self._writer = "pandas"
+            else:
+                self._writer = pa_csv.CSVWriter(self.temp_path, schema)
+        if self._writer == "pandas":
+            batch.to_pandas().to_csv(self._file, header=self.rows == 0, index=False)
+        else:
+            self._writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+    def close(self):
+        """
+        Termine l'écriture et publie le fichier. Retourne le nombre de lignes écrites.
+        """
+        if isinstance(self._writer, pa_csv.CSVWriter):
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        if self._writer is None:
+            # Aucune donnée : seul l'en-tête est écrit
+            with open(self.temp_path, "w", newline="", encoding="utf-8") as file:
+                if self.columns:
+                    csv.writer(file).writerow(self.columns)
+        os.replace(self.temp_path, self.path)
+        return self.rows
+
+    def abort(self):
+        """
+        Abandonne l'écriture et supprime le fichier temporaire.
+        """
+        try:
+            if isinstance(self._writer, pa_csv.CSVWriter):
+                self._writer.close()
+            if self._file is not None:
+                self._file.close()
+        finally:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ParquetSink:
+    """
+    Sortie Parquet compressée et typée, écrite par groupes de lignes dans un fichier
+    temporaire renommé à la fermeture.
+    """
+
+    extension = ".parquet"
+
+    def __init__(self, path, columns=None, schema=None, compression="zstd", row_group_size=131072):
+        """
+        Arguments:
+            path (str): Chemin final du fichier.
+            columns (list): Noms des colonnes, pour l'écriture de lignes (tuples).
+            schema (pyarrow.Schema): Schéma Arrow des données ; déduit du premier lot s'il est absent.
+            compression (str): Codec de compression ("zstd", "snappy", ...).
+            row_group_size (int): Nombre de lignes par groupe de lignes.
+        """
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.columns = list(columns) if columns is not None else (schema.names if schema is not None else None)
+        self.schema = schema
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._writer = None
+        self._pending = []
+        self._pending_rows = 0
+
+    def write_rows(self, rows):
+        self.write_batch(rows_to_batch(rows, self.columns, self.schema))
+
+    def write_batch(self, batch):
+        if self.schema is None:
+            self.schema = batch.schema
+        elif batch.schema != self.schema:
+            if batch.num_rows == 0:
+                return
+            batch = pa.Table.from_batches([batch]).cast(self.schema).combine_chunks().to_batches()[0]
+        self._pending.append(batch)
+        self._pending_rows += batch.num_rows
+        self.rows += batch.num_rows
+        if self._pending_rows >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.temp_path, self.schema, compression=self.compression)
+        if self._pending:
+            table = pa.Table.from_batches(self._pending, schema=self.schema)
+            self._writer.write_table(table, row_group_size=self.row_group_size)
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self):
+        """
+        Termine l'écriture et publie le fichier. Retourne le nombre de lignes écrites.
+        """
+        if self.schema is None:
+            self.schema = pa.schema([pa.field(name, pa.string()) for name in self.columns or []])
+        self._flush()
+        self._writer.close()
+        os.replace(self.temp_path, self.path)
+        return self.rows
+
+    def abort(self):
+        """
+        Abandonne l'écriture et supprime le fichier temporaire.
+        """
+        try:
+            if self._writer is not None:
+                self._writer.close()
+        finally:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def get_output_format():
+    """
+    Retourne le format de sortie choisi par la variable d'environnement OUTPUT_FORMAT (csv par défaut).
+
+    Lève:
+        ValueError: Si le format n'est pas pris en charge.
+    """
+    output_format = os.getenv("OUTPUT_FORMAT", "csv").lower()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Format de sortie non pris en charge : {output_format} (attendu : {', '.join(OUTPUT_FORMATS)})")
+    return output_format
+
+
+def output_path(base_path, output_format=None):
+    """
+    Retourne le chemin de sortie correspondant au format (extension ajoutée si absente).
+    """
+    extension = (ParquetSink if (output_format or get_output_format()) == "parquet" else CsvSink).extension
+    return base_path if base_path.endswith(extension) else f"{base_path}{extension}"
+
+
+def parquet_options():
+    """
+    Retourne les options d'écriture Parquet (PARQUET_COMPRESSION, PARQUET_ROW_GROUP_SIZE).
+    """
+    return {
+        "compression": os.getenv("PARQUET_COMPRESSION", "zstd"),
+        "row_group_size": int(os.getenv("PARQUET_ROW_GROUP_SIZE", "131072")),
+    }
+
+
+def open_sink(base_path, output_format=None, columns=None, schema=None):
+    """
+    Ouvre une sortie au format demandé (CSV ou Parquet).
+
+    Arguments:
+        base_path (str): Chemin de sortie sans extension (ajoutée selon le format).
+        output_format (str): "csv" ou "parquet" ; OUTPUT_FORMAT par défaut.
+        columns (list): Noms des colonnes, pour l'écriture de lignes (tuples).
+        schema (pyarrow.Schema): Schéma Arrow des données, s'il est connu.
+
+    Retourne:
+        CsvSink | ParquetSink: Sortie ouverte, à utiliser comme gestionnaire de contexte.
+    """
+    output_format = output_format or get_output_format()
+    path = output_path(base_path, output_format)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if output_format == "parquet":
+        return ParquetSink(path, columns, schema, **parquet_options())
+    return CsvSink(path, columns, schema)
+
+
+def convert_csv_stream(source, base_path, output_format=None, reopen=None, encoding="utf8", transform=None):
+    """
+    Convertit un flux CSV en sortie typée, bloc par bloc, avec inférence des types par pyarrow.
+
+    Si un bloc ultérieur contredit les types déduits du premier bloc, la conversion
+    est relancée (via `reopen`) avec toutes les colonnes en texte.
+
+    Arguments:
+        source (file): Flux binaire du CSV.
+        base_path (str): Chemin de sortie sans extension.
+        output_format (str): "csv" ou "parquet" ; OUTPUT_FORMAT par défaut.
+        reopen (callable): Fonction rouvrant le flux CSV depuis le début, pour la relance en texte.
+        encoding (str): Encodage du CSV source (la sortie est toujours en UTF-8).
+        transform (callable): Fonction appliquée à l'itérateur des lots (ex : dédoublonnage),
+                              rappelée à chaque tentative.
+
+    Retourne:
+        tuple: (chemin écrit, nombre de lignes).
+    """
+    read_options = pa_csv.ReadOptions(encoding=encoding)
+    reader = pa_csv.open_csv(source, read_options=read_options)
+    try:
+        with open_sink(base_path, output_format, schema=reader.schema) as sink:
+            for batch in (transform(reader) if transform else reader):
+                sink.write_batch(batch)
+        return sink.path, sink.rows
+    except pa.ArrowInvalid:
+        if reopen is None:
+            raise
+        column_types = {name: pa.string() for name in reader.schema.names}
+        with reopen() as retry_source:
+            retry_reader = pa_csv.open_csv(
+                retry_source, read_options=read_options,
+                convert_options=pa_csv.ConvertOptions(column_types=column_types),
+            )
+            with open_sink(base_path, output_format, schema=retry_reader.schema) as sink:
+                for batch in (transform(retry_reader) if transform else retry_reader):
+                    sink.write_batch(batch)
+        return sink.path, sink.rows
@@ -0,0 +1,262 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from dotenv import load_dotenv
+
+import limits
+import metrics
+import log_setup
+
+# Chargement des variables d'environnement depuis un fichier .env
+load_dotenv()
+
+# Configuration de la journalisation, avant l'import des scripts d'extraction : elle
+# s'applique à toutes les étapes, dont les configurations propres sont alors ignorées
+log_setup.configure("./logs/pipeline.log")
+
+
+class Stage:
+    """
+    Étape du pipeline : une fonction exécutée une fois que ses dépendances ont réussi.
+    """
+
+    def __init__(self, name, run, depends_on=(), internal=False):
+        """
+        Arguments:
+            name (str): Nom de l'étape.
+            run (callable): Fonction appelée avec le dictionnaire des résultats des étapes
+                            précédentes ; retourne un résultat ou lève une exception.
+            depends_on (tuple): Étapes devant réussir avant celle-ci.
+            internal (bool): Étape ajoutée automatiquement lorsqu'une étape sélectionnée en dépend.
+        """
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        self.internal = internal
+
+
+class StageFailed(Exception):
+    """
+    Levée par une étape qui s'est exécutée jusqu'au bout mais a rencontré des erreurs
+    sur certains éléments (tables, blobs).
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} élément(s) en échec : {', '.join(str(key) for key in list(errors)[:5])}")
+
+
+def check_errors(errors):
+    """
+    Lève StageFailed si une étape retourne des erreurs par élément.
+    """
+    if errors:
+        raise StageFailed(errors)
+    return errors
+
+
+def run_blob_listing(results):
+    """
+    Liste une seule fois les dossiers du conteneur utilisés par les étapes parquet et csv.
+    """
+    import extract_csv
+    import extract_parquet
+    from blob_listing import BlobListing
+    from blob_session import BlobSession
+
+    # Session partagée par les deux étapes Blob : son SAS est renouvelé avant expiration
+    session = BlobSession.from_env()
+    listing = BlobListing()
+    listing.add_consumer("parquet", [".parquet"], extract_parquet.PARQUET_FOLDERS)
+    listing.add_consumer("csv", extract_csv.EXTENSIONS, extract_csv.TARGET_FOLDERS)
+    return {"session": session, "blobs": listing.run(session.container_client())}
+
+
+def run_sql(results):
+    import extract_sql
+    return check_errors(extract_sql.main())
+
+
+def run_parquet(results):
+    import extract_parquet
+    listing = results["blob_listing"]
+    list_blobs = [blob for blobs in listing["blobs"]["parquet"].values() for blob in blobs]
+    return check_errors(extract_parquet.main(list_blobs, session=listing["session"]))
+
+
+def run_csv(results):
+    import extract_csv
+    listing = results["blob_listing"]
+    return check_errors(extract_csv.main(listing["blobs"]["csv"], session=listing["session"]))
+
+
+def run_catalog(results):
+    import duckdb_catalog
+    if duckdb_catalog.main(["register"]) != 0:
+        raise RuntimeError("Enregistrement incomplet dans le catalogue DuckDB (voir logs/pipeline.log).")
+
+
+def run_arrow(results):
+    import dataset_store
+    if dataset_store.main(["publish"]) != 0:
+        raise RuntimeError("Publication incomplète dans le magasin Arrow (voir logs/pipeline.log).")
+
+
+# Étapes du pipeline et leurs dépendances : SQL Server et le conteneur Blob sont des
+# sources indépendantes, extraites en parallèle ; le catalogue DuckDB et le magasin Arrow
+# sont alimentés à la fin, en parallèle.
+STAGES = {
+    stage.name: stage for stage in [
+        Stage("blob_listing", run_blob_listing, internal=True),
+        Stage("sql", run_sql),
+        Stage("parquet", run_parquet, ["blob_listing"]),
+        Stage("csv", run_csv, ["blob_listing"]),
+        Stage("catalog", run_catalog, ["sql", "parquet", "csv"]),
+        Stage("arrow", run_arrow, ["sql", "parquet", "csv"]),
+    ]
+}
+
+
+def select_stages(names, stages=STAGES):
+    """
+    Retourne les étapes à exécuter : celles demandées, plus les étapes internes dont elles dépendent.
+
+    Les dépendances non sélectionnées (par exemple `sql` pour `--stages catalog`) sont
+    considérées comme déjà satisfaites par une exécution précédente.
+
+    Lève:
+        ValueError: Si une étape demandée n'existe pas.
+    """
+    unknown = [name for name in names if name not in stages]
+    if unknown:
+        raise ValueError(f"Étape(s) inconnue(s) : {', '.join(unknown)} (disponibles : {', '.join(public_stages(stages))})")
+    selected = set(names)
+    pending = list(names)
+    while pending:
+        for dependency in stages[pending.pop()].depends_on:
+            if stages[dependency].internal and dependency not in selected:
+                selected.add(dependency)
+                pending.append(dependency)
+    return [name for name in stages if name in selected]
+
+
+def public_stages(stages=STAGES):
+    return [name for name, stage in stages.items() if not stage.internal]
+
+
+def run_pipeline(names, stages=STAGES):
+    """
+    Exécute les étapes sélectionnées dans l'ordre de leurs dépendances, en parallèle dès que possible.
+
+    Une étape démarre dès que toutes ses dépendances sélectionnées ont réussi ; une
+    étape dont une dépendance a échoué est marquée « ignorée ». La durée totale est
+    ainsi celle de la branche la plus longue, et non la somme des étapes.
+
+    Arguments:
+        names (list): Étapes à exécuter.
+        stages (dict): Définition des étapes.
+
+    Retourne:
+        dict: Statut de chaque étape : {"status": "ok" | "failed" | "skipped", "duration": float, "error": str}.
+    """
+    selected = select_stages(names, stages)
+    results = {}
+    report = {}
+    remaining = list(selected)
+    running = {}
+
+    def execute(stage):
+        logging.info(f"Début de l'étape {stage.name}")
+        with metrics.timer("pipeline", stage.name):
+            return stage.run(results)
+
+    with ThreadPoolExecutor(max_workers=len(selected) or 1, thread_name_prefix="stage") as executor:
+        while remaining or running:
+            for name in list(remaining):
+                dependencies = [dep for dep in stages[name].depends_on if dep in selected]
+                if any(report.get(dep, {}).get("status") in ("failed", "skipped") for dep in dependencies):
+                    remaining.remove(name)
+                    report[name] = {"status": "skipped", "duration": 0.0, "error": "dépendance en échec"}
+                    logging.warning(f"Étape {name} ignorée : une dépendance a échoué.")
+                elif all(report.get(dep, {}).get("status") == "ok" for dep in dependencies):
+                    remaining.remove(name)
+                    running[executor.submit(execute, stages[name])] = (name, time.perf_counter())
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, start = running.pop(future)
+                duration = time.perf_counter() - start
+                try:
+                    results[name] = future.result()
+                    report[name] = {"status": "ok", "duration": duration, "error": None}
+                    logging.info(f"Étape {name} terminée en {duration:.1f} s")
+                except Exception as e:
+                    report[name] = {"status": "failed", "duration": duration, "error": str(e)}
+                    logging.error(f"Étape {name} en échec après {duration:.1f} s : {e}")
+
+    # Arrête le renouvellement du SAS de la session partagée par les étapes Blob
+    if "blob_listing" in results:
+        results["blob_listing"]["session"].close()
+
+    return {name: report[name] for name in selected}
+
+
+def main(argv=None):
+    """
+    Point d'entrée en ligne de commande :
+
+        python scripts/pipeline.py
+        python scripts/pipeline.py --stages sql,catalog --max-concurrency 8 --max-bandwidth 50
+
+    Retourne:
+        int: 0 si toutes les étapes ont réussi, 1 sinon.
+    """
+    parser = argparse.ArgumentParser(description="Extraction concurrente des sources SQL Server et Blob.")
+    parser.add_argument("--stages", default=os.getenv("PIPELINE_STAGES", ",".join(public_stages())),
+                        help=f"Étapes à exécuter, séparées par des virgules ({', '.join(public_stages())})")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="Nombre maximal d'opérations simultanées, toutes étapes confondues (PIPELINE_MAX_CONCURRENCY)")
+    parser.add_argument("--max-bandwidth", type=float, default=None,
+                        help="Débit maximal des téléchargements en Mo/s, toutes étapes confondues (PIPELINE_MAX_BANDWIDTH_MBPS)")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.stages.split(",") if name.strip()]
+    try:
+        selected = select_stages(names)
+    except ValueError as e:
+        parser.error(str(e))
+
+    configured = limits.configure(args.max_concurrency, args.max_bandwidth)
+    bandwidth = f"{configured.max_bandwidth / (1024 * 1024):g} Mo/s" if configured.max_bandwidth else "illimité"
+    logging.info(
+        f"Pipeline : étapes {selected}, opérations simultanées : {configured.max_concurrency or 'illimitées'}, "
+        f"débit : {bandwidth}"
+    )
+
+    start = time.perf_counter()
+    metrics.reset()
+    report = run_pipeline(names)
+    elapsed = time.perf_counter() - start
+    report_path = metrics.write_report("pipeline", extra={"stages": report})
+
+    print(f"{'Étape':<14}{'Statut':<10}{'Durée':>10}")
+    for name, entry in report.items():
+        line = f"{name:<14}{entry['status']:<10}{entry['duration']:>9.1f}s"
+        if entry["error"]:
+            line += f"  {entry['error']}"
+        print(line)
+    print(f"Durée totale : {elapsed:.1f} s")
+    if report_path:
+        print(f"Rapport d'exécution : {report_path}")
+
+    return 0 if all(entry["status"] == "ok" for entry in report.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
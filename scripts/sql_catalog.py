@@ -0,0 +1,238 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Types SQL Server qui ne peuvent pas être exportés tels quels
+INCOMPATIBLE_TYPES = {"geometry", "geography", "xml", "hierarchyid", "sql_variant"}
+
+# Types entiers utilisables pour découper une table en plages de clés
+INTEGER_TYPES = {"tinyint", "smallint", "int", "bigint"}
+
+
+def schema_filter(schemas):
+    """
+    Construit la liste SQL des schémas ciblés (ex : "'Sales', 'Person'").
+    """
+    return ", ".join(f"'{schema}'" for schema in schemas)
+
+
+class Catalog:
+    """
+    Instantané du catalogue des tables à extraire : colonnes, types, clé primaire
+    et nombre approximatif de lignes de chaque table des schémas ciblés.
+
+    Les nombres de lignes évoluent sans modification de structure : ils sont relus
+    à chaque chargement, même lorsque le reste du catalogue vient du cache.
+    """
+
+    def __init__(self, tables, fingerprint=None):
+        """
+        Arguments:
+            tables (dict): (schéma, table) -> {"columns": [...], "primary_key": [...], "row_count": int}.
+            fingerprint (str): Empreinte des schémas au moment de l'instantané.
+        """
+        self.tables = tables
+        self.fingerprint = fingerprint
+
+    def tables_in_schema(self, schema_name):
+        return [table for schema, table in self.tables if schema == schema_name]
+
+    def columns(self, schema_name, table_name):
+        """
+        Retourne la description (nom, type, précision, échelle, nullabilité) des colonnes compatibles d'une table.
+        """
+        return [
+            column for column in self.tables[(schema_name, table_name)]["columns"]
+            if column["data_type"] not in INCOMPATIBLE_TYPES
+        ]
+
+    def compatible_columns(self, schema_name, table_name):
+        return [column["name"] for column in self.columns(schema_name, table_name)]
+
+    def primary_key(self, schema_name, table_name):
+        return self.tables[(schema_name, table_name)]["primary_key"]
+
+    def partition_key(self, schema_name, table_name):
+        """
+        Retourne une colonne entière permettant de découper la table en plages : la clé
+        primaire si elle porte sur une seule colonne entière, sinon la première colonne
+        entière de la clé primaire composite. None si aucune ne convient.
+        """
+        types = {column["name"]: column["data_type"] for column in self.columns(schema_name, table_name)}
+        for column in self.primary_key(schema_name, table_name):
+            if types.get(column) in INTEGER_TYPES:
+                return column
+        return None
+
+    def row_counts(self):
+        return {key: table["row_count"] for key, table in self.tables.items()}
+
+    def update_row_counts(self, row_counts):
+        for key, table in self.tables.items():
+            table["row_count"] = row_counts.get(key, 0)
+
+    def to_dict(self):
+        return {
+            "fingerprint": self.fingerprint,
+            "tables": [
+                {"schema": schema, "table": table, **details}
+                for (schema, table), details in self.tables.items()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        tables = {(entry["schema"], entry["table"]): {
+            "columns": entry["columns"],
+            "primary_key": entry["primary_key"],
+            "row_count": entry["row_count"],
+        } for entry in data["tables"]}
+        return cls(tables, data.get("fingerprint"))
+
+
+def get_schema_fingerprint(connection, schemas):
+    """
+    Calcule une empreinte des schémas ciblés (nombre de tables et dates de modification).
+
+    Toute création, suppression ou modification de structure d'une table change l'empreinte.
+
+    Retourne:
+        str: Empreinte des schémas.
+    """
+    query = f"""
+    SELECT COUNT(*), MAX(t.modify_date), CHECKSUM_AGG(CHECKSUM(t.object_id, t.modify_date))
+    FROM sys.tables t
+    JOIN sys.schemas s ON s.schema_id = t.schema_id
+    WHERE s.name IN ({schema_filter(schemas)});
+    """
+    cursor = connection.cursor()
+    try:
+        count, last_modified, checksum = cursor.execute(query).fetchone()
+    finally:
+        cursor.close()
+    return f"{','.join(sorted(schemas))}|{count}|{last_modified.isoformat() if last_modified else ''}|{checksum}"
+
+
+def fetch_row_counts(connection, schemas):
+    """
+    Récupère le nombre approximatif de lignes des tables des schémas ciblés (sys.partitions),
+    sans parcourir les tables.
+
+    Retourne:
+        dict: (schéma, table) -> nombre de lignes.
+    """
+    query = f"""
+    SELECT s.name, t.name, SUM(p.rows)
+    FROM sys.tables t
+    JOIN sys.schemas s ON s.schema_id = t.schema_id
+    JOIN sys.partitions p ON p.object_id = t.object_id AND p.index_id IN (0, 1)
+    WHERE s.name IN ({schema_filter(schemas)})
+    GROUP BY s.name, t.name;
+    """
+    cursor = connection.cursor()
+    try:
+        return {(schema, table): int(rows or 0) for schema, table, rows in cursor.execute(query).fetchall()}
+    finally:
+        cursor.close()
+
+
+def fetch_catalog(connection, schemas):
+    """
+    Récupère en une seule requête les tables, colonnes, types et clés primaires de
+    tous les schémas ciblés, puis leurs nombres de lignes approximatifs.
+
+    Arguments:
+        connection (pyodbc.Connection): Connexion active à la base de données.
+        schemas (list): Schémas à décrire.
+
+    Retourne:
+        Catalog: Instantané du catalogue.
+    """
+    query = f"""
+    SELECT c.TABLE_SCHEMA, c.TABLE_NAME, c.COLUMN_NAME, c.DATA_TYPE,
+           c.NUMERIC_PRECISION, c.NUMERIC_SCALE, c.IS_NULLABLE,
+           pk.ORDINAL_POSITION AS PK_POSITION
+    FROM INFORMATION_SCHEMA.COLUMNS c
+    JOIN INFORMATION_SCHEMA.TABLES t
+        ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME AND t.TABLE_TYPE = 'BASE TABLE'
+    LEFT JOIN (
+        SELECT kcu.TABLE_SCHEMA, kcu.TABLE_NAME, kcu.COLUMN_NAME, kcu.ORDINAL_POSITION
+        FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc
+        JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE kcu
+            ON kcu.CONSTRAINT_SCHEMA = tc.CONSTRAINT_SCHEMA AND kcu.CONSTRAINT_NAME = tc.CONSTRAINT_NAME
+        WHERE tc.CONSTRAINT_TYPE = 'PRIMARY KEY'
+    ) pk ON pk.TABLE_SCHEMA = c.TABLE_SCHEMA AND pk.TABLE_NAME = c.TABLE_NAME AND pk.COLUMN_NAME = c.COLUMN_NAME
+    WHERE c.TABLE_SCHEMA IN ({schema_filter(schemas)})
+    ORDER BY c.TABLE_SCHEMA, c.TABLE_NAME, c.ORDINAL_POSITION;
+    """
+    tables = {}
+    primary_keys = {}
+    cursor = connection.cursor()
+    try:
+        for row in cursor.execute(query).fetchall():
+            key = (row.TABLE_SCHEMA, row.TABLE_NAME)
+            table = tables.setdefault(key, {"columns": [], "primary_key": [], "row_count": 0})
+            table["columns"].append({
+                "name": row.COLUMN_NAME,
+                "data_type": row.DATA_TYPE,
+                "precision": row.NUMERIC_PRECISION,
+                "scale": row.NUMERIC_SCALE,
+                "nullable": row.IS_NULLABLE == "YES",
+            })
+            if row.PK_POSITION is not None:
+                primary_keys.setdefault(key, []).append((row.PK_POSITION, row.COLUMN_NAME))
+    finally:
+        cursor.close()
+
+    for key, columns in primary_keys.items():
+        tables[key]["primary_key"] = [name for _, name in sorted(columns)]
+    catalog = Catalog(tables)
+    catalog.update_row_counts(fetch_row_counts(connection, schemas))
+    return catalog
+
+
+def load_catalog(connection, schemas, cache_path=None):
+    """
+    Charge le catalogue des schémas ciblés, depuis le cache local si l'empreinte des schémas n'a pas changé
+    (les nombres de lignes, eux, sont toujours relus).
+
+    Arguments:
+        connection (pyodbc.Connection): Connexion active à la base de données.
+        schemas (list): Schémas à décrire.
+        cache_path (str): Fichier JSON du cache ; aucun cache si None.
+
+    Retourne:
+        Catalog: Instantané du catalogue.
+
+    Lève:
+        Exception: Si la récupération du catalogue échoue, elle est journalisée et levée.
+    """
+    try:
+        fingerprint = get_schema_fingerprint(connection, schemas) if cache_path else None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as file:
+                    cached = Catalog.from_dict(json.load(file))
+                if cached.fingerprint == fingerprint:
+                    cached.update_row_counts(fetch_row_counts(connection, schemas))
+                    logger.info(f"Catalogue chargé depuis le cache {cache_path} ({len(cached.tables)} tables).")
+                    return cached
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Cache du catalogue illisible ({cache_path}) : {e}")
+
+        catalog = fetch_catalog(connection, schemas)
+        catalog.fingerprint = fingerprint
+        logger.info(f"Catalogue récupéré : {len(catalog.tables)} tables dans {schemas}.")
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération du catalogue : {e}")
+        raise
+
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        temp_path = f"{cache_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(catalog.to_dict(), file, indent=2, ensure_ascii=False)
+        os.replace(temp_path, cache_path)
+    return catalog
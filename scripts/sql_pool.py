@@ -0,0 +1,76 @@
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+
+from limits import get_limits
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    Pool borné de connexions à la base de données, partagé entre plusieurs threads.
+
+    Les connexions sont créées à la demande jusqu'à `max_size`, puis réutilisées.
+    Une connexion n'est jamais utilisée par deux threads à la fois ; une connexion
+    ayant rencontré une erreur est fermée au lieu d'être remise dans le pool. Chaque
+    emprunt occupe aussi un emplacement de la limite globale d'opérations simultanées.
+    """
+
+    def __init__(self, connect, max_size=4):
+        """
+        Arguments:
+            connect (callable): Fonction sans argument retournant une nouvelle connexion.
+            max_size (int): Nombre maximal de connexions ouvertes simultanément.
+        """
+        self.max_size = max_size
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @contextmanager
+    def connection(self):
+        """
+        Emprunte une connexion au pool pendant la durée du bloc `with`.
+        """
+        with get_limits().slot():
+            with self._borrow() as connection:
+                yield connection
+
+    @contextmanager
+    def _borrow(self):
+        self._slots.acquire()
+        try:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        try:
+            yield connection
+        except BaseException:
+            self._discard(connection)
+            self._slots.release()
+            raise
+        self._idle.put(connection)
+        self._slots.release()
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception as e:
+            logger.warning(f"Erreur lors de la fermeture d'une connexion du pool : {e}")
+
+    def close(self):
+        """
+        Ferme toutes les connexions inactives du pool.
+        """
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
@@ -0,0 +1,64 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class WatermarkStore:
+    """
+    Marques de haut niveau (high-water marks) des extractions SQL incrémentales.
+
+    Pour chaque table, le fichier conserve la colonne de suivi (ex : ModifiedDate)
+    et la plus grande valeur déjà exportée. L'extraction suivante ne lit que les
+    lignes dont la valeur est supérieure ou égale à cette marque.
+    """
+
+    def __init__(self, path):
+        """
+        Arguments:
+            path (str): Chemin du fichier JSON des marques.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Fichier de marques illisible ({path}), extraction complète : {e}")
+                self.entries = {}
+
+    def get(self, schema_name, table_name, column):
+        """
+        Retourne la marque enregistrée pour une table, ou None si elle est absente
+        ou porte sur une autre colonne.
+        """
+        entry = self.entries.get(f"{schema_name}.{table_name}")
+        if not entry or entry.get("column") != column or entry.get("value") is None:
+            return None
+        return datetime.fromisoformat(entry["value"])
+
+    def set(self, schema_name, table_name, column, value):
+        """
+        Enregistre la nouvelle marque d'une table et sauvegarde le fichier.
+        """
+        with self._lock:
+            self.entries[f"{schema_name}.{table_name}"] = {"column": column, "value": value.isoformat()}
+        self.save()
+
+    def save(self):
+        """
+        Écrit les marques sur disque de manière atomique (fichier temporaire puis renommage).
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(self.entries, file, indent=2)
+            os.replace(temp_path, self.path)
@@ -0,0 +1,227 @@
+import os
+import codecs
+import shutil
+
+import numpy as np
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from output_sink import convert_csv_stream, open_sink, output_path, parquet_options
+
+# Moteurs de transformation des CSV : pandas (par blocs, un cœur) ou Polars (plan paresseux, tous les cœurs)
+ENGINES = ("pandas", "polars")
+
+# Nombre de lignes examinées par Polars pour déduire les types des colonnes
+POLARS_INFER_ROWS = int(os.getenv("POLARS_INFER_SCHEMA_ROWS", "10000"))
+
+
+def get_engine():
+    """
+    Retourne le moteur choisi par la variable d'environnement TRANSFORM_ENGINE (pandas par défaut).
+
+    Lève:
+        ValueError: Si le moteur n'est pas pris en charge.
+    """
+    engine = os.getenv("TRANSFORM_ENGINE", "pandas").lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Moteur de transformation non pris en charge : {engine} (attendu : {', '.join(ENGINES)})")
+    return engine
+
+
+def get_encoding():
+    """
+    Retourne l'encodage des CSV sources (CSV_ENCODING, UTF-8 par défaut).
+    """
+    return os.getenv("CSV_ENCODING", "utf-8")
+
+
+def get_deduplicate():
+    """
+    Indique si les lignes en double des CSV doivent être supprimées (CSV_DEDUPLICATE).
+    """
+    return os.getenv("CSV_DEDUPLICATE", "0") == "1"
+
+
+def is_utf8(encoding):
+    return codecs.lookup(encoding).name == "utf-8"
+
+
+def requires_rewrite():
+    """
+    Indique si les CSV doivent être réécrits même au format CSV (ré-encodage ou dédoublonnage).
+    """
+    return get_deduplicate() or not is_utf8(get_encoding())
+
+
+class RowDeduplicator:
+    """
+    Filtre des lignes déjà rencontrées, lot après lot, à partir d'une empreinte 64 bits par ligne.
+
+    La mémoire utilisée est de l'ordre de quelques dizaines d'octets par ligne distincte,
+    indépendamment de la largeur des lignes.
+
+    Les empreintes portent sur le texte des valeurs : les types d'une même colonne
+    peuvent varier d'un lot à l'autre (entiers lus en flottants dans un lot contenant
+    une valeur manquante) sans que des lignes identiques soient comptées deux fois.
+    Les blocs pandas doivent donc être lus en texte (`dtype=str`).
+    """
+
+    def __init__(self):
+        self._seen = set()
+
+    def keep_mask(self, hashes):
+        mask = np.zeros(len(hashes), dtype=bool)
+        seen = self._seen
+        for index, value in enumerate(hashes.tolist()):
+            if value not in seen:
+                seen.add(value)
+                mask[index] = True
+        return mask
+
+    def filter_frame(self, frame):
+        return frame[self.keep_mask(pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy())]
+
+    def filter_batches(self, batches):
+        for batch in batches:
+            text = pa.table([pc.cast(column, pa.string()) for column in batch.columns], names=batch.schema.names)
+            yield batch.filter(pa.array(self.keep_mask(
+                pd.util.hash_pandas_object(text.to_pandas(), index=False).to_numpy()
+            )))
+
+
+def _pandas_transform(open_source, base_path, output_format, chunksize, encoding, deduplicate):
+    if output_format == "parquet":
+        # Inférence des types par pyarrow, comme pour une conversion sans transformation
+        transform = (lambda batches: RowDeduplicator().filter_batches(batches)) if deduplicate else None
+        with open_source() as source:
+            return convert_csv_stream(source, base_path, output_format, reopen=open_source,
+                                      encoding="utf8" if is_utf8(encoding) else encoding, transform=transform)
+
+    path = output_path(base_path, output_format)
+    temp_path = f"{path}.tmp"
+    deduplicator = RowDeduplicator() if deduplicate else None
+    rows = 0
+    try:
+        # En dédoublonnage, les valeurs sont lues et réécrites telles quelles (texte) : les
+        # empreintes ne dépendent pas des types déduits pour chaque bloc
+        text_options = {"dtype": str, "keep_default_na": False} if deduplicate else {}
+        with open_source() as source, open(temp_path, "w", newline="", encoding="utf-8") as output:
+            for index, chunk in enumerate(pd.read_csv(source, chunksize=chunksize, encoding=encoding, **text_options)):
+                if deduplicator is not None:
+                    chunk = deduplicator.filter_frame(chunk)
+                chunk.to_csv(output, header=index == 0, index=False)
+                rows += len(chunk)
+        os.replace(temp_path, path)
+        return path, rows
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _copy_as_utf8(open_source, path, encoding):
+    """
+    Copie un flux CSV dans un fichier local, en le convertissant en UTF-8 au fil de l'eau si nécessaire.
+    """
+    with open_source() as source, open(path, "wb") as output:
+        if is_utf8(encoding):
+            shutil.copyfileobj(source, output, 1024 * 1024)
+            return
+        reader = codecs.getreader(encoding)(source)
+        for block in iter(lambda: reader.read(1024 * 1024), ""):
+            output.write(block.encode("utf-8"))
+
+
+def _polars_write(source_path, base_path, output_format, deduplicate, infer_schema_length):
+    frame = pl.scan_csv(source_path, infer_schema_length=infer_schema_length)
+    path = output_path(base_path, output_format)
+
+    if output_format == "parquet" and not deduplicate:
+        options = parquet_options()
+        compression = "uncompressed" if options["compression"] == "none" else options["compression"]
+        temp_path = f"{path}.tmp"
+        try:
+            frame.sink_parquet(temp_path, compression=compression, row_group_size=options["row_group_size"])
+            rows = pq.ParquetFile(temp_path).metadata.num_rows
+            os.replace(temp_path, path)
+            return path, rows
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    # Polars 0.18 n'a pas de sink_csv : le plan est exécuté en flux vers un fichier Arrow IPC
+    # temporaire, relu lot par lot (et dédoublonné par empreintes) pour écrire la sortie
+    ipc_path = f"{path}.arrow.tmp"
+    try:
+        frame.sink_ipc(ipc_path, compression="lz4")
+        with pa.OSFile(ipc_path, "rb") as source:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+            if deduplicate:
+                batches = RowDeduplicator().filter_batches(batches)
+            with open_sink(base_path, output_format, schema=reader.schema) as sink:
+                for batch in batches:
+                    sink.write_batch(batch)
+        return sink.path, sink.rows
+    finally:
+        if os.path.exists(ipc_path):
+            os.remove(ipc_path)
+
+
+def _polars_transform(open_source, base_path, output_format, encoding, deduplicate, source_path):
+    # scan_csv lit un fichier local en UTF-8 : un membre d'archive ou un CSV dans un autre encodage
+    # est d'abord copié (et converti) dans un fichier temporaire
+    temp_source = None
+    if source_path is None or not is_utf8(encoding):
+        temp_source = f"{base_path}.source.csv"
+        _copy_as_utf8(open_source, temp_source, encoding)
+        source_path = temp_source
+
+    try:
+        try:
+            return _polars_write(source_path, base_path, output_format, deduplicate, POLARS_INFER_ROWS)
+        except (pl.exceptions.ComputeError, pl.exceptions.SchemaError):
+            # Types contredits au-delà des lignes examinées : toutes les colonnes sont relues en texte
+            return _polars_write(source_path, base_path, output_format, deduplicate, 0)
+    finally:
+        if temp_source is not None and os.path.exists(temp_source):
+            os.remove(temp_source)
+
+
+def transform_csv(open_source, base_path, output_format="csv", engine=None, chunksize=100000, source_path=None):
+    """
+    Réécrit un CSV au format de sortie demandé avec le moteur choisi.
+
+    Le CSV est décodé depuis CSV_ENCODING et réécrit en UTF-8, avec des types déduits
+    des données, et ses lignes en double sont supprimées si CSV_DEDUPLICATE=1.
+
+    - pandas : lecture par blocs de `chunksize` lignes sur un seul cœur (pyarrow pour
+      la conversion en Parquet) ; la mémoire est bornée par un bloc.
+    - polars : plan paresseux (`scan_csv`) exécuté en flux sur tous les cœurs, écrit
+      directement par `sink_parquet`, ou via un fichier Arrow IPC temporaire relu lot
+      par lot (sortie CSV, dédoublonnage) ; la mémoire reste bornée par un lot.
+
+    Dans les deux cas, le dédoublonnage ne conserve qu'une empreinte de 8 octets par
+    ligne distincte, jamais les lignes elles-mêmes.
+
+    Arguments:
+        open_source (callable): Fonction retournant le flux binaire du CSV (rappelée en cas de relance).
+        base_path (str): Chemin de sortie sans extension.
+        output_format (str): "csv" ou "parquet".
+        engine (str): "pandas" ou "polars" ; TRANSFORM_ENGINE par défaut.
+        chunksize (int): Nombre de lignes par bloc pour le moteur pandas.
+        source_path (str): Chemin local du CSV s'il existe, pour une lecture directe par Polars.
+
+    Retourne:
+        tuple: (chemin écrit, nombre de lignes).
+    """
+    engine = engine or get_engine()
+    encoding = get_encoding()
+    deduplicate = get_deduplicate()
+    if engine == "polars":
+        return _polars_transform(open_source, base_path, output_format, encoding, deduplicate, source_path)
+    return _pandas_transform(open_source, base_path, output_format, chunksize, encoding, deduplicate)